@@ -7,10 +7,12 @@ Logic unchanged. SQLite fully removed.
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import logging
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import traceback
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(__file__))
@@ -22,10 +24,14 @@ from config import Config
 from long_term.contract import is_valid_memory
 from long_term.extractor import extract_memory, extract_name, extract_multiple
 from long_term.store import MemoryStore
-from long_term.decay import apply_smart_decay, refresh_memory, get_decay_stats, boost_related_memories
+from long_term.decay import (
+    apply_decay, apply_maintenance, maintenance_due, refresh_memories,
+    get_decay_stats, boost_related_memories
+)
 from long_term.retrieval import (
     retrieve_relevant, retrieve_by_type, get_user_name,
-    get_user_preferences, get_commitments, search_memories
+    get_user_preferences, get_commitments, search_memories,
+    extract_keywords, RelevanceCache
 )
 from long_term.injector import (
     inject_memory_context, get_memory_summary,
@@ -51,6 +57,20 @@ except ImportError:
             return f
 
 
+# Import Redis (optional, enables sessions shared across workers)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -60,32 +80,88 @@ CORS(app, origins=Config.CORS_ORIGINS)
 memory_store = MemoryStore()   # ✅ FIXED (Removed DATABASE_PATH)
 llm = SimpleLLM()
 admin_auth = AdminAuth(Config.ADMIN_USERNAME, Config.ADMIN_PASSWORD)
+relevance_cache = RelevanceCache()
 
-# Session tracking
+# Consolidation/pruning runs here, off the request path; the connection pool
+# reserves a connection for each of these threads
+maintenance_executor = ThreadPoolExecutor(max_workers=Config.MAINTENANCE_WORKERS)
+
+# Session tracking (Redis when configured, otherwise per-process)
+session_redis = (
+    redis.Redis.from_url(Config.REDIS_URL, decode_responses=True)
+    if redis is not None and Config.REDIS_URL else None
+)
 user_sessions = {}
 
 
+def _session_key(user_id: str) -> str:
+    return f"session:{user_id}"
+
+
 def get_or_create_session(user_id: str = "default"):
+    if session_redis is not None:
+        key = _session_key(user_id)
+        now = time.time()
+
+        pipe = session_redis.pipeline()
+        pipe.hsetnx(key, "turn", 1)
+        pipe.hsetnx(key, "created_at", now)
+        pipe.hset(key, "last_active", now)
+        pipe.expire(key, Config.SESSION_TTL)
+        pipe.hgetall(key)
+        session = pipe.execute()[-1]
+
+        session["turn"] = int(session["turn"])
+        session["user_id"] = user_id
+        return session
+
+    now = time.time()
     if user_id not in user_sessions:
         user_sessions[user_id] = {
             "turn": 1,
             "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "last_active": datetime.now().isoformat()
+            "created_at": now,
+            "last_active": now
         }
     else:
-        user_sessions[user_id]["last_active"] = datetime.now().isoformat()
+        user_sessions[user_id]["last_active"] = now
 
     return user_sessions[user_id]
 
 
+def advance_session_turn(session: dict):
+    if session_redis is not None:
+        session_redis.hincrby(_session_key(session["user_id"]), "turn", 1)
+
+    session["turn"] += 1
+
+
+def count_active_sessions() -> int:
+    if session_redis is not None:
+        return sum(1 for _ in session_redis.scan_iter(_session_key("*")))
+
+    return len(user_sessions)
+
+
 def log_error(error: Exception, context: str = ""):
-    print("\n" + "=" * 60)
-    print(f"ERROR in {context}")
-    print(f"Time: {datetime.now().isoformat()}")
-    print(f"Error: {str(error)}")
-    traceback.print_exc()
-    print("=" * 60 + "\n")
+    logger.exception("ERROR in %s: %s", context, error)
+
+
+def run_maintenance(user_id: str, current_turn: int):
+    # Consolidation rewrites confidences and deactivates rows, so keep the
+    # user's chat turns from interleaving with it
+    with memory_store.user_lock(user_id):
+        apply_maintenance(memory_store, user_id, current_turn)
+
+
+def log_maintenance_failure(future):
+    """Done-callback so exceptions raised in the background job are logged"""
+    if future.cancelled():
+        return
+
+    error = future.exception()
+    if error is not None:
+        logger.error("ERROR in maintenance: %s", error, exc_info=error)
 
 
 # ================= PUBLIC API =================
@@ -98,7 +174,7 @@ def health_check():
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "memory_stats": stats,
-            "active_sessions": len(user_sessions)
+            "active_sessions": count_active_sessions()
         })
     except Exception as e:
         log_error(e, "health_check")
@@ -119,28 +195,37 @@ def chat():
         current_turn = session["turn"]
 
         new_memories = extract_multiple(message, current_turn, user_id)
-        memories_created = []
-
-        for new_memory in new_memories:
-            if memory_store.insert(new_memory, user_id):
-                memories_created.append(new_memory)
+        memories_created = memory_store.insert_many(new_memories, user_id)
 
         primary_memory = memories_created[0] if memories_created else None
-
-        apply_smart_decay(memory_store, user_id, current_turn)
-
-        active_memories = memory_store.fetch_active(user_id)
-        relevant_memories = retrieve_relevant(
-            message, active_memories, top_k=5, min_score=0.1
-        )
-
-        query_words = message.lower().split()
-        boost_related_memories(
-            memory_store, user_id, current_turn, query_words, boost_amount=0.01
-        )
-
-        for mem in relevant_memories:
-            refresh_memory(memory_store, mem["id"], current_turn, boost=0.01)
+        if memories_created:
+            relevance_cache.invalidate(user_id)
+
+        # Load active memories once and thread them through the turn; the
+        # user lock keeps background maintenance out of this read-modify-write
+        with memory_store.user_lock(user_id):
+            active_memories = memory_store.fetch_active(user_id)
+            active_memories = apply_decay(
+                memory_store, user_id, current_turn, active_memories
+            )
+
+            relevant_memories = relevance_cache.retrieve(
+                user_id, message, active_memories, top_k=5, min_score=0.1
+            )
+
+            query_words = extract_keywords(message)
+            active_memories = boost_related_memories(
+                memory_store, user_id, current_turn, query_words,
+                boost_amount=0.01, memories=active_memories
+            )
+
+            confidences = {mem.id: mem.confidence for mem in active_memories}
+            refresh_memories(
+                memory_store,
+                {mem["id"]: confidences.get(mem["id"], mem["confidence"])
+                 for mem in relevant_memories},
+                current_turn, boost=0.01
+            )
 
         memory_context = inject_memory_context(relevant_memories, style="detailed")
         user_name = get_user_name(active_memories)
@@ -153,7 +238,11 @@ def chat():
         )
 
         summary = get_memory_summary(relevant_memories)
-        session["turn"] += 1
+        advance_session_turn(session)
+
+        if maintenance_due(current_turn):
+            future = maintenance_executor.submit(run_maintenance, user_id, current_turn)
+            future.add_done_callback(log_maintenance_failure)
 
         return jsonify({
             "response": response_text,
@@ -172,15 +261,3 @@ def chat():
             "error": "An error occurred processing your message",
             "details": str(e) if app.debug else None
         }), 500
-
-
-# ================= MAIN =================
-
-if __name__ == '__main__':
-    print("🧠 Memory Chatbot Backend Starting...")
-    print(f"🗄️ MySQL Database: {Config.MYSQL_DATABASE}")  # ✅ FIXED
-    print(f"🔐 Admin: {Config.ADMIN_USERNAME}")
-    print(f"🌐 CORS Origins: {Config.CORS_ORIGINS}")
-    print("🚀 Server running on http://localhost:5000\n")
-
-    app.run(debug=Config.DEBUG, host='0.0.0.0', port=5000)
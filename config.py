@@ -1,19 +1,56 @@
 # backend/config.py
 
+import os
+import secrets
+
+from dotenv import load_dotenv
+
+# Load a local .env file (development); real environment variables win
+load_dotenv()
+
+
+def _require(name: str, allow_empty: bool = False) -> str:
+    """Value of a required environment variable, with a clear error if unset"""
+    value = os.environ.get(name)
+    if value is None or (not value and not allow_empty):
+        raise RuntimeError(
+            f"{name} is not set; define it in the environment or in .env "
+            f"(see .env.example)"
+        )
+    return value
+
+
+def _flag(name: str, default: str = "0") -> bool:
+    """Boolean environment variable accepting 1/true/yes/on in any case"""
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     # =========================
     # MySQL Database Settings
     # =========================
-    MYSQL_HOST = "localhost"
-    MYSQL_USER = "root"
-    MYSQL_PASSWORD = "@MONA689"   # CHANGE THIS
-    MYSQL_DATABASE = "memory_chatbot"
+    MYSQL_HOST = os.environ.get("MYSQL_HOST", "localhost")
+    MYSQL_USER = os.environ.get("MYSQL_USER", "root")
+    MYSQL_PASSWORD = _require("MYSQL_PASSWORD", allow_empty=True)
+    MYSQL_DATABASE = os.environ.get("MYSQL_DATABASE", "memory_chatbot")
+    MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", "10"))   # Request threads per worker
+
+    # =========================
+    # Background maintenance
+    # =========================
+    MAINTENANCE_WORKERS = 1     # Threads running consolidation/pruning per worker
+
+    # =========================
+    # Sessions
+    # =========================
+    REDIS_URL = os.environ.get("REDIS_URL")  # e.g. "redis://localhost:6379/0" (requires redis)
+    SESSION_TTL = 86400     # Seconds of inactivity before a session expires
 
     # =========================
     # Admin credentials
     # =========================
-    ADMIN_USERNAME = "admin"
-    ADMIN_PASSWORD = "12345"
+    ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
+    ADMIN_PASSWORD = _require("ADMIN_PASSWORD")
 
     # =========================
     # Memory settings
@@ -24,10 +61,11 @@ class Config:
     # =========================
     # Flask settings
     # =========================
-    SECRET_KEY = "your-secret-key-change-this"
-    DEBUG = True
+    # Set SECRET_KEY when running several workers so they share one key
+    SECRET_KEY = os.environ.get("SECRET_KEY") or secrets.token_hex(32)
+    DEBUG = _flag("DEBUG")
 
     # =========================
     # CORS
     # =========================
-    CORS_ORIGINS = ["http://localhost:3000"]
+    CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -17,6 +17,7 @@ ALLOWED_TYPES = {
     "goal": "Long-term objectives and aspirations",
     "relationship": "Information about other people"
 }
+_ALLOWED_TYPE_NAMES = frozenset(ALLOWED_TYPES)
 
 # Confidence thresholds
 MIN_CONFIDENCE = 0.7
@@ -33,15 +34,37 @@ DECAY_MULTIPLIER = {
     "relationship": 0.6 # Relationships persist
 }
 
+# Effective per-type decay rate (DECAY_RATE * multiplier), resolved once
+TYPE_DECAY_RATES = {
+    mem_type: DECAY_RATE * multiplier
+    for mem_type, multiplier in DECAY_MULTIPLIER.items()
+}
+
+# Priority weights used when deciding which memories to keep
+TYPE_PRIORITY_WEIGHTS = {
+    "fact": 1.2,
+    "preference": 1.0,
+    "constraint": 1.3,
+    "commitment": 0.8,  # Lower priority as they're time-sensitive
+    "goal": 1.1,
+    "relationship": 1.0
+}
+
 # Memory limits
 MAX_MEMORIES_PER_TYPE = 100
 MAX_TOTAL_MEMORIES = 500
+MAX_MEMORIES_PER_MESSAGE = 5  # Extracted from a single chat message
 MIN_MEMORY_AGE_FOR_DECAY = 2  # Don't decay memories newer than 2 turns
+MERGE_SIMILARITY_THRESHOLD = 0.7  # Word-set Jaccard above which memories merge
 
 # Content validation
 MIN_CONTENT_LENGTH = 3
 MAX_CONTENT_LENGTH = 500
 
+# Fields every memory dict must carry
+_REQUIRED_FIELDS = ("id", "type", "content", "confidence", "created_turn", "active")
+_NUMBER_TYPES = (int, float)
+
 
 def is_valid_memory(memory_dict: Dict[str, Any]) -> tuple[bool, str]:
     """
@@ -53,20 +76,19 @@ def is_valid_memory(memory_dict: Dict[str, Any]) -> tuple[bool, str]:
     Returns:
         tuple: (is_valid: bool, error_message: str)
     """
-    required_fields = {"id", "type", "content", "confidence", "created_turn", "active"}
-    
     # Check all required fields exist
-    missing_fields = required_fields - set(memory_dict.keys())
-    if missing_fields:
-        return False, f"Missing required fields: {missing_fields}"
+    for field in _REQUIRED_FIELDS:
+        if field not in memory_dict:
+            missing_fields = {f for f in _REQUIRED_FIELDS if f not in memory_dict}
+            return False, f"Missing required fields: {missing_fields}"
     
     # Check type is allowed
-    if memory_dict["type"] not in ALLOWED_TYPES:
+    if memory_dict["type"] not in _ALLOWED_TYPE_NAMES:
         return False, f"Invalid type '{memory_dict['type']}'. Allowed: {list(ALLOWED_TYPES.keys())}"
     
     # Check confidence is valid
     confidence = memory_dict["confidence"]
-    if not isinstance(confidence, (int, float)):
+    if type(confidence) not in _NUMBER_TYPES:
         return False, "Confidence must be a number"
     
     if not (0 <= confidence <= 1):
@@ -95,7 +117,7 @@ def is_valid_memory(memory_dict: Dict[str, Any]) -> tuple[bool, str]:
     
     # Check active flag
     active = memory_dict.get("active")
-    if active not in [0, 1, True, False]:
+    if active not in (0, 1):  # True/False compare equal to 1/0
         return False, "Active must be boolean or 0/1"
     
     return True, "Valid"
@@ -116,8 +138,7 @@ def calculate_decay_amount(memory_type: str, age: int, base_confidence: float) -
     if age < MIN_MEMORY_AGE_FOR_DECAY:
         return 0.0
     
-    multiplier = DECAY_MULTIPLIER.get(memory_type, 1.0)
-    decay = DECAY_RATE * multiplier * age
+    decay = TYPE_DECAY_RATES.get(memory_type, DECAY_RATE) * age
     
     # Exponential decay for very old memories
     if age > 50:
@@ -133,8 +154,8 @@ def should_merge_memories(mem1: Dict, mem2: Dict) -> bool:
     Determine if two memories should be merged
     
     Args:
-        mem1: First memory
-        mem2: Second memory
+        mem1: First memory (may carry pre-split lowercase 'tokens')
+        mem2: Second memory (may carry pre-split lowercase 'tokens')
         
     Returns:
         bool: True if memories should be merged
@@ -144,8 +165,8 @@ def should_merge_memories(mem1: Dict, mem2: Dict) -> bool:
         return False
     
     # Similar content (simple check - can be improved with embeddings)
-    content1_words = set(mem1["content"].lower().split())
-    content2_words = set(mem2["content"].lower().split())
+    content1_words = mem1.get("tokens") or set(mem1["content"].lower().split())
+    content2_words = mem2.get("tokens") or set(mem2["content"].lower().split())
     
     if len(content1_words) == 0 or len(content2_words) == 0:
         return False
@@ -155,7 +176,7 @@ def should_merge_memories(mem1: Dict, mem2: Dict) -> bool:
     
     similarity = overlap / total if total > 0 else 0
     
-    return similarity > 0.7
+    return similarity > MERGE_SIMILARITY_THRESHOLD
 
 
 def get_memory_priority(memory_type: str, confidence: float, age: int) -> float:
@@ -171,16 +192,7 @@ def get_memory_priority(memory_type: str, confidence: float, age: int) -> float:
     Returns:
         float: Priority score
     """
-    type_weights = {
-        "fact": 1.2,
-        "preference": 1.0,
-        "constraint": 1.3,
-        "commitment": 0.8,  # Lower priority as they're time-sensitive
-        "goal": 1.1,
-        "relationship": 1.0
-    }
-    
-    type_weight = type_weights.get(memory_type, 1.0)
+    type_weight = TYPE_PRIORITY_WEIGHTS.get(memory_type, 1.0)
     recency_score = max(0, 1 - (age * 0.01))  # Decreases with age
     
     return confidence * type_weight * (0.3 + 0.7 * recency_score)
@@ -1,12 +1,22 @@
 # backend/database/db.py
 
-import mysql.connector
+from mysql.connector.pooling import MySQLConnectionPool
 from config import Config
 
+# Shared by every caller in the process; connections are opened once and
+# handed out warm. Closing a pooled connection returns it to the pool.
+# get_connection() fails rather than waits when the pool is empty, so it
+# holds one connection per request thread plus one per maintenance thread.
+pool = MySQLConnectionPool(
+    pool_name="mem",
+    pool_size=Config.MYSQL_POOL_SIZE + Config.MAINTENANCE_WORKERS,
+    pool_reset_session=False,
+    host=Config.MYSQL_HOST,
+    user=Config.MYSQL_USER,
+    password=Config.MYSQL_PASSWORD,
+    database=Config.MYSQL_DATABASE,
+    autocommit=True
+)
+
 def get_connection():
-    return mysql.connector.connect(
-        host=Config.MYSQL_HOST,
-        user=Config.MYSQL_USER,
-        password=Config.MYSQL_PASSWORD,
-        database=Config.MYSQL_DATABASE
-    )
+    return pool.get_connection()
@@ -5,59 +5,117 @@ Memory Decay - Enhanced human-like forgetting mechanism
 Implements smart decay based on memory type, usage, and importance
 """
 
-from typing import List, Tuple
+import logging
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
 from .contract import (
-    DECAY_RATE, MIN_CONFIDENCE, DECAY_MULTIPLIER, 
-    MIN_MEMORY_AGE_FOR_DECAY, calculate_decay_amount
+    DECAY_RATE, MIN_CONFIDENCE, TYPE_DECAY_RATES,
+    MIN_MEMORY_AGE_FOR_DECAY, MERGE_SIMILARITY_THRESHOLD
 )
 
+logger = logging.getLogger(__name__)
 
-def apply_decay(store, user_id: str, current_turn: int):
+
+def _decay_pass(memories: List, current_turn: int,
+                memory_types: Optional[List[str]] = None,
+                usage_retention: bool = True) -> Tuple[List, List, List]:
     """
-    Apply intelligent time-based decay to all active memories
-    Memories that fall below MIN_CONFIDENCE are deactivated
+    Compute decayed confidences for a batch of memories in a single pass
+    Same math as calculate_decay_amount, inlined to avoid a call per memory
     
     Args:
-        store: MemoryStore instance
-        user_id: User identifier
-        current_turn: Current conversation turn
+        memories: Active memories
+        current_turn: Current turn
+        memory_types: Memory types to decay (None = all)
+        usage_retention: Whether frequently used memories decay slower
+        
+    Returns:
+        tuple: (still-active memories, (id, confidence) updates, ids to deactivate)
     """
-    memories = store.fetch_active(user_id)
+    rates = TYPE_DECAY_RATES
+    min_age = MIN_MEMORY_AGE_FOR_DECAY
+    min_confidence = MIN_CONFIDENCE
+    
+    remaining = []
+    updates = []
+    deactivates = []
     
     for mem in memories:
-        mem_id = mem[0]
-        mem_type = mem[1]
-        confidence = mem[3]
-        created_turn = mem[4]
-        last_used = mem[5]
-        use_count = mem[6] if len(mem) > 6 else 1
+        mem_type = mem.type
         
-        # Calculate age since last use
-        age = current_turn - last_used
+        # Skip if not in target types
+        if memory_types and mem_type not in memory_types:
+            remaining.append(mem)
+            continue
         
-        # Skip recently created or used memories
-        if age < MIN_MEMORY_AGE_FOR_DECAY:
+        # Calculate age since last use; skip recently created or used memories
+        age = current_turn - mem.last_used_turn
+        if age < min_age:
+            remaining.append(mem)
             continue
         
-        # Calculate decay amount based on type and age
-        decay_amount = calculate_decay_amount(mem_type, age, confidence)
+        confidence = mem.confidence
+        
+        # Decay amount based on type and age, faster for very old memories
+        decay_amount = rates.get(mem_type, DECAY_RATE) * age
+        if age > 50:
+            decay_amount *= 1.5
+        if age > 100:
+            decay_amount *= 2.0
+        decay_amount = min(decay_amount, confidence - min_confidence + 0.01)
         
-        # Apply usage-based retention bonus
         # Frequently used memories decay slower
-        if use_count > 1:
-            usage_bonus = min(0.1, use_count * 0.01)
-            decay_amount *= (1 - usage_bonus)
+        if usage_retention:
+            use_count = mem.use_count
+            if use_count > 1:
+                decay_amount *= (1 - min(0.1, use_count * 0.01))
         
-        # Calculate new confidence
         new_confidence = max(0, confidence - decay_amount)
         
         # Deactivate if below threshold
-        if new_confidence < MIN_CONFIDENCE:
-            store.deactivate(mem_id)
-            print(f"Memory {mem_id[:8]} deactivated (confidence: {new_confidence:.2f})")
+        if new_confidence < min_confidence:
+            deactivates.append(mem.id)
+            logger.debug("Memory %s deactivated (confidence: %.2f)", mem.id[:8], new_confidence)
         else:
-            # Update confidence
-            store.update_confidence(mem_id, new_confidence)
+            updates.append((mem.id, new_confidence))
+            remaining.append(mem._replace(confidence=new_confidence))
+    
+    return remaining, updates, deactivates
+
+
+def apply_decay(store, user_id: str, current_turn: int,
+                memories: Optional[List] = None) -> List:
+    """
+    Apply intelligent time-based decay to all active memories
+    Memories that fall below MIN_CONFIDENCE are deactivated
+    
+    Args:
+        store: MemoryStore instance
+        user_id: User identifier
+        current_turn: Current conversation turn
+        memories: Active memories already loaded this turn (None = fetch
+                  only the memories old enough to decay)
+        
+    Returns:
+        List of the given (or fetched) memories that are still active
+    """
+    # Nothing can be old enough to decay yet
+    if current_turn < MIN_MEMORY_AGE_FOR_DECAY:
+        return memories if memories is not None else []
+    
+    if memories is None:
+        memories = store.fetch_decayable(
+            user_id, current_turn - MIN_MEMORY_AGE_FOR_DECAY
+        )
+    
+    remaining, updates, deactivates = _decay_pass(memories, current_turn)
+    
+    # Flush all changes in one round trip each
+    store.batch_update_confidence(updates)
+    store.batch_deactivate(deactivates)
+    
+    return remaining
 
 
 def apply_selective_decay(store, user_id: str, current_turn: int, 
@@ -71,34 +129,23 @@ def apply_selective_decay(store, user_id: str, current_turn: int,
         current_turn: Current turn
         memory_types: List of memory types to decay (None = all)
     """
-    memories = store.fetch_active(user_id)
+    if current_turn < MIN_MEMORY_AGE_FOR_DECAY:
+        return
     
-    for mem in memories:
-        mem_id = mem[0]
-        mem_type = mem[1]
-        
-        # Skip if not in target types
-        if memory_types and mem_type not in memory_types:
-            continue
-        
-        confidence = mem[3]
-        last_used = mem[5]
-        
-        age = current_turn - last_used
-        
-        if age < MIN_MEMORY_AGE_FOR_DECAY:
-            continue
-        
-        decay_amount = calculate_decay_amount(mem_type, age, confidence)
-        new_confidence = max(0, confidence - decay_amount)
-        
-        if new_confidence < MIN_CONFIDENCE:
-            store.deactivate(mem_id)
-        else:
-            store.update_confidence(mem_id, new_confidence)
+    memories = store.fetch_decayable(
+        user_id, current_turn - MIN_MEMORY_AGE_FOR_DECAY
+    )
+    
+    _, updates, deactivates = _decay_pass(
+        memories, current_turn, memory_types, usage_retention=False
+    )
+    
+    store.batch_update_confidence(updates)
+    store.batch_deactivate(deactivates)
 
 
-def refresh_memory(store, mem_id: str, current_turn: int, boost: float = 0.0):
+def refresh_memory(store, mem_id: str, current_turn: int, boost: float = 0.0,
+                   confidence: Optional[float] = None):
     """
     Refresh a memory when it's used (reset its decay)
     Optionally boost confidence
@@ -108,22 +155,42 @@ def refresh_memory(store, mem_id: str, current_turn: int, boost: float = 0.0):
         mem_id: Memory ID
         current_turn: Current turn
         boost: Optional confidence boost (0-0.1)
+        confidence: Current confidence of the memory (required for boost)
     """
     store.update_last_used(mem_id, current_turn)
     
     # Optional confidence boost for reinforcement
+    if boost > 0 and confidence is not None:
+        new_confidence = min(0.99, confidence + boost)
+        store.update_confidence(mem_id, new_confidence)
+
+
+def refresh_memories(store, confidences: Dict[str, float], current_turn: int,
+                     boost: float = 0.0):
+    """
+    Refresh several used memories at once (batched refresh_memory)
+    
+    Args:
+        store: MemoryStore instance
+        confidences: Current confidence keyed by memory ID
+        current_turn: Current turn
+        boost: Optional confidence boost (0-0.1)
+    """
+    if not confidences:
+        return
+    
+    store.batch_update_last_used(confidences.keys(), current_turn)
+    
     if boost > 0:
-        memories = store.fetch_active(store.user_id)
-        for mem in memories:
-            if mem[0] == mem_id:
-                old_confidence = mem[3]
-                new_confidence = min(0.99, old_confidence + boost)
-                store.update_confidence(mem_id, new_confidence)
-                break
+        store.batch_update_confidence(
+            (mem_id, min(0.99, confidence + boost))
+            for mem_id, confidence in confidences.items()
+        )
 
 
 def boost_related_memories(store, user_id: str, current_turn: int, 
-                          keywords: List[str], boost_amount: float = 0.02):
+                          keywords: Iterable[str], boost_amount: float = 0.02,
+                          memories: Optional[List] = None) -> List:
     """
     Boost confidence of memories related to current conversation
     
@@ -131,24 +198,82 @@ def boost_related_memories(store, user_id: str, current_turn: int,
         store: MemoryStore instance
         user_id: User ID
         current_turn: Current turn
-        keywords: Keywords to search for
+        keywords: Keywords to search for (e.g. extract_keywords of the message)
         boost_amount: Amount to boost confidence
+        memories: Active memories already loaded this turn (None = look up
+                  candidates through the FULLTEXT index)
+        
+    Returns:
+        List of the given (or looked-up) memories with boosts applied
     """
-    memories = store.fetch_active(user_id)
+    keywords = {keyword.lower() for keyword in keywords}
+    if not keywords:
+        return memories if memories is not None else []
+    
+    if memories is None:
+        memories = store.fetch_matching(user_id, keywords)
+    
+    boosted = []
+    updates = []
     
     for mem in memories:
-        mem_id = mem[0]
-        content = mem[2].lower()
-        confidence = mem[3]
+        content = mem.content_lower
         
         # Check if any keyword is in content
-        if any(keyword.lower() in content for keyword in keywords):
-            new_confidence = min(0.99, confidence + boost_amount)
-            store.update_confidence(mem_id, new_confidence)
-            refresh_memory(store, mem_id, current_turn)
+        if any(keyword in content for keyword in keywords):
+            new_confidence = min(0.99, mem.confidence + boost_amount)
+            updates.append((mem.id, new_confidence))
+            mem = mem._replace(confidence=new_confidence)
+        
+        boosted.append(mem)
+    
+    if updates:
+        store.batch_update_confidence(updates)
+        store.batch_update_last_used([mem_id for mem_id, _ in updates], current_turn)
+    
+    return boosted
+
+
+def _merge_candidates(memories: List) -> List[set]:
+    """
+    Find pairs of memories that may be similar enough to merge
+    
+    Uses prefix filtering: two word sets with Jaccard similarity above
+    MERGE_SIMILARITY_THRESHOLD must share a word among the rarest
+    len - ceil(threshold * len) + 1 words of each set, so only memories
+    sharing such a word (and type) need the exact should_merge_memories check.
+    
+    Args:
+        memories: Active memories
+        
+    Returns:
+        List where entry i holds the indices j > i of candidate partners
+    """
+    token_sets = [
+        {(mem.type, word) for word in mem.tokens} for mem in memories
+    ]
+    frequency = Counter(token for tokens in token_sets for token in tokens)
+    
+    candidates = [set() for _ in memories]
+    index = defaultdict(list)
+    
+    for i, tokens in enumerate(token_sets):
+        if not tokens:
+            continue
+        
+        ordered = sorted(tokens, key=lambda token: (frequency[token], token))
+        prefix_len = len(ordered) - math.ceil(MERGE_SIMILARITY_THRESHOLD * len(ordered)) + 1
+        
+        for token in ordered[:prefix_len]:
+            for j in index[token]:
+                candidates[j].add(i)
+            index[token].append(i)
+    
+    return candidates
 
 
-def consolidate_memories(store, user_id: str, current_turn: int):
+def consolidate_memories(store, user_id: str, current_turn: int,
+                         memories: Optional[List] = None) -> List:
     """
     Consolidate similar memories to prevent redundancy
     Merges memories with similar content
@@ -157,35 +282,45 @@ def consolidate_memories(store, user_id: str, current_turn: int):
         store: MemoryStore instance
         user_id: User ID
         current_turn: Current turn
+        memories: Active memories already loaded this turn (None = fetch)
+        
+    Returns:
+        List of memories that are still active
     """
     from .contract import should_merge_memories
     
-    memories = store.fetch_active(user_id)
+    if memories is None:
+        memories = store.fetch_active(user_id)
+    candidates = _merge_candidates(memories)
     processed = set()
+    boosted = {}
     
     for i, mem1 in enumerate(memories):
-        mem1_id = mem1[0]
+        mem1_id = mem1.id
         
         if mem1_id in processed:
             continue
         
         mem1_dict = {
-            'type': mem1[1],
-            'content': mem1[2],
-            'confidence': mem1[3]
+            'type': mem1.type,
+            'content': mem1.content,
+            'confidence': mem1.confidence,
+            'tokens': mem1.tokens
         }
         
-        for j in range(i + 1, len(memories)):
+        # Only pairs that passed the prefix filter can be similar enough
+        for j in sorted(candidates[i]):
             mem2 = memories[j]
-            mem2_id = mem2[0]
+            mem2_id = mem2.id
             
             if mem2_id in processed:
                 continue
             
             mem2_dict = {
-                'type': mem2[1],
-                'content': mem2[2],
-                'confidence': mem2[3]
+                'type': mem2.type,
+                'content': mem2.content,
+                'confidence': mem2.confidence,
+                'tokens': mem2.tokens
             }
             
             # Check if should merge
@@ -194,19 +329,26 @@ def consolidate_memories(store, user_id: str, current_turn: int):
                 if mem1_dict['confidence'] >= mem2_dict['confidence']:
                     # Boost mem1, deactivate mem2
                     new_confidence = min(0.99, mem1_dict['confidence'] + 0.05)
-                    store.update_confidence(mem1_id, new_confidence)
-                    store.deactivate(mem2_id)
+                    boosted[mem1_id] = new_confidence
                     processed.add(mem2_id)
                 else:
                     # Boost mem2, deactivate mem1
                     new_confidence = min(0.99, mem2_dict['confidence'] + 0.05)
-                    store.update_confidence(mem2_id, new_confidence)
-                    store.deactivate(mem1_id)
+                    boosted[mem2_id] = new_confidence
                     processed.add(mem1_id)
                     break
+    
+    store.batch_update_confidence(boosted.items())
+    store.batch_deactivate(processed)
+    
+    return [
+        mem._replace(confidence=boosted[mem.id]) if mem.id in boosted else mem
+        for mem in memories if mem.id not in processed
+    ]
 
 
-def prune_low_priority_memories(store, user_id: str, max_memories: int = 100):
+def prune_low_priority_memories(store, user_id: str, max_memories: int = 100,
+                                memories: Optional[List] = None) -> List:
     """
     Remove lowest priority memories when count exceeds limit
     
@@ -214,58 +356,102 @@ def prune_low_priority_memories(store, user_id: str, max_memories: int = 100):
         store: MemoryStore instance
         user_id: User ID
         max_memories: Maximum number of active memories
+        memories: Active memories already loaded this turn (None = fetch)
+        
+    Returns:
+        List of memories that are still active
     """
     from .contract import get_memory_priority
     
-    memories = store.fetch_active(user_id)
+    if memories is None:
+        memories = store.fetch_active(user_id)
     
     if len(memories) <= max_memories:
-        return
+        return memories
     
     # Calculate priority for each memory
     scored_memories = []
     for mem in memories:
-        mem_id = mem[0]
-        mem_type = mem[1]
-        confidence = mem[3]
-        created_turn = mem[4]
-        last_used = mem[5]
+        age = mem.last_used_turn - mem.created_turn
+        priority = get_memory_priority(mem.type, mem.confidence, age)
         
-        age = last_used - created_turn
-        priority = get_memory_priority(mem_type, confidence, age)
-        
-        scored_memories.append((mem_id, priority))
+        scored_memories.append((mem.id, priority))
     
     # Sort by priority (lowest first)
     scored_memories.sort(key=lambda x: x[1])
     
     # Deactivate lowest priority memories
     to_remove = len(memories) - max_memories
+    pruned = set()
     for i in range(to_remove):
         mem_id = scored_memories[i][0]
-        store.deactivate(mem_id)
-        print(f"Pruned low-priority memory: {mem_id[:8]}")
+        pruned.add(mem_id)
+        logger.debug("Pruned low-priority memory: %s", mem_id[:8])
+    
+    store.batch_deactivate(pruned)
+    
+    return [mem for mem in memories if mem.id not in pruned]
+
 
+def maintenance_due(current_turn: int) -> bool:
+    """Whether consolidation or pruning is scheduled for this turn"""
+    return current_turn % 10 == 0 or current_turn % 20 == 0
 
-def apply_smart_decay(store, user_id: str, current_turn: int):
+
+def apply_maintenance(store, user_id: str, current_turn: int,
+                      memories: Optional[List] = None) -> List:
     """
-    Enhanced decay that considers multiple factors
+    Periodic consolidation and pruning, separate from per-turn decay so it
+    can run off the request path
     
     Args:
         store: MemoryStore instance
         user_id: User ID
         current_turn: Current turn
+        memories: Active memories (None = fetch)
+        
+    Returns:
+        List of memories that are still active
     """
-    # 1. Apply standard decay
-    apply_decay(store, user_id, current_turn)
+    if memories is None:
+        memories = store.fetch_active(user_id)
     
-    # 2. Consolidate similar memories
+    # Consolidate similar memories
     if current_turn % 10 == 0:  # Every 10 turns
-        consolidate_memories(store, user_id, current_turn)
+        memories = consolidate_memories(store, user_id, current_turn, memories)
     
-    # 3. Prune if too many memories
+    # Prune if too many memories
     if current_turn % 20 == 0:  # Every 20 turns
-        prune_low_priority_memories(store, user_id)
+        memories = prune_low_priority_memories(store, user_id, memories=memories)
+    
+    return memories
+
+
+def apply_smart_decay(store, user_id: str, current_turn: int,
+                      memories: Optional[List] = None) -> List:
+    """
+    Enhanced decay that considers multiple factors
+    
+    Args:
+        store: MemoryStore instance
+        user_id: User ID
+        current_turn: Current turn
+        memories: Active memories already loaded this turn (None = fetch)
+        
+    Returns:
+        List of memories that are still active
+    """
+    if memories is None:
+        memories = store.fetch_active(user_id)
+    
+    # 1. Apply standard decay
+    memories = apply_decay(store, user_id, current_turn, memories)
+    
+    # 2. Consolidate and prune on their schedule
+    if maintenance_due(current_turn):
+        memories = apply_maintenance(store, user_id, current_turn, memories)
+    
+    return memories
 
 
 def get_decay_stats(store, user_id: str, current_turn: int) -> dict:
@@ -287,7 +473,7 @@ def get_decay_stats(store, user_id: str, current_turn: int) -> dict:
     stable = 0   # High confidence
     
     for mem in memories:
-        confidence = mem[3]
+        confidence = mem.confidence
         
         if confidence < MIN_CONFIDENCE + 0.1:
             at_risk += 1
@@ -5,22 +5,105 @@ Memory Extractor - Enhanced extraction with better pattern matching
 Uses advanced NLP patterns and context awareness
 """
 
-import uuid
+import functools
+import logging
 import re
-from typing import Dict, Optional, List
-from .contract import MIN_CONFIDENCE, is_valid_memory, ALLOWED_TYPES
+import secrets
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, TypedDict
+from .contract import (
+    MIN_CONFIDENCE, MAX_MEMORIES_PER_MESSAGE, is_valid_memory, ALLOWED_TYPES
+)
+
+logger = logging.getLogger(__name__)
+
+# Optional: google-re2 matches in linear time, immune to backtracking blowup
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+_NAME_IS_RE = re.compile(r"my name is\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)")
+_I_AM_RE = re.compile(r"i(?:'m| am)\s+([a-zA-Z]+)(?:\s|$|\.)")
+_CALL_ME_RE = re.compile(r"call me\s+([a-zA-Z]+)")
+_NAME_SKIP_WORDS = frozenset({"a", "an", "the", "going", "working", "living", "from", "here"})
+# am/pm is usually written against its digits ("9pm"), with no \b between
+_TIME_WORDS_RE = re.compile(
+    r"\b(?:morning|afternoon|evening|night|monday|tuesday|wednesday|"
+    r"thursday|friday|saturday|sunday|weekday|weekend)\b"
+    r"|(?:\b|(?<=\d))(?:am|pm)\b"
+)
+_TEMPORAL_RE = re.compile(r"\b(?:after|before|between|during|at|on)\b")
+_NEGATIVE_RE = re.compile(
+    r"\b(?:don't|do not|never|not|won't|will not|can't|cannot|shouldn't|should not)\b"
+)
+
+
+class PatternConfig(TypedDict, total=False):
+    """Extraction settings for one memory type"""
+    patterns: List[str]
+    keywords: List[str]
+    confidence: float
+    regex: Any  # re.Pattern or re2 compiled pattern
+# re's Unicode \w, \d and \s, for RE2 whose shorthand classes are ASCII-only
+
+# re's Unicode \\w, \\d and \\s, for RE2 whose shorthand classes are ASCII-only
+_RE2_UNICODE_CLASSES = {
+    "w": r"\p{L}\p{N}_",
+    "d": r"\p{Nd}",
+    "s": r"\t\n\v\f\r\x1c-\x1f\x{85}\p{Z}",
+}
+
+
+def _re2_unicode(pattern: str) -> str:
+    """pattern with \\w, \\d and \\s spelled out as the Unicode classes re matches"""
+    parts = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            chars = _RE2_UNICODE_CLASSES.get(pattern[i + 1])
+            if chars is None:
+                parts.append(pattern[i:i + 2])
+            else:
+                parts.append(chars if in_class else f"[{chars}]")
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        parts.append(char)
+        i += 1
+    return "".join(parts)
+
+
+def _compile_linear(pattern: str) -> Any:
+    """Compile with re2 when installed and the pattern is supported, else re"""
+    if re2 is not None:
+        try:
+            return re2.compile(_re2_unicode(pattern))
+        except re2.error:
+            pass
+    return re.compile(pattern)
 
 
 class MemoryExtractor:
     """Enhanced memory extraction with pattern matching and context"""
     
-    def __init__(self):
-        self.patterns = self._init_patterns()
+    def __init__(self) -> None:
+        self.patterns: Dict[str, PatternConfig] = self._init_patterns()
+        self._keyword_re, self._keyword_types = self._init_keyword_index()
+        self._trigger_re = self._init_trigger_re()
+        self._classify = functools.lru_cache(maxsize=4096)(self._classify_message)
         self.stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to'}
     
-    def _init_patterns(self) -> Dict:
+    def _init_patterns(self) -> Dict[str, PatternConfig]:
         """Initialize extraction patterns"""
-        return {
+        patterns: Dict[str, PatternConfig] = {
             "preference": {
                 "patterns": [
                     r"i (prefer|like|love|enjoy|want|favor|choose)\s+(.+)",
@@ -92,6 +175,56 @@ class MemoryExtractor:
                 "confidence": 0.90
             }
         }
+        
+        # One alternation per type: any pattern matching selects the type.
+        # Messages are lowercased before matching, so no IGNORECASE needed.
+        for config in patterns.values():
+            config["regex"] = _compile_linear(
+                "|".join(f"(?:{pattern})" for pattern in config["patterns"])
+            )
+        
+        return patterns
+    
+    def _init_keyword_index(self) -> Tuple[re.Pattern, Dict[str, FrozenSet[str]]]:
+        """
+        Build one regex that finds every type keyword in a single scan
+        
+        The lookahead reports the longest keyword starting at each position;
+        since every keyword that is a prefix of it occurs there too, each
+        keyword maps to the types of all its keyword prefixes.
+        """
+        owners: Dict[str, set] = defaultdict(set)
+        for mem_type, config in self.patterns.items():
+            for keyword in config["keywords"]:
+                owners[keyword].add(mem_type)
+        
+        keyword_types = {
+            keyword: frozenset(
+                mem_type
+                for prefix, types in owners.items() if keyword.startswith(prefix)
+                for mem_type in types
+            )
+            for keyword in owners
+        }
+        
+        alternation = "|".join(
+            re.escape(keyword) for keyword in sorted(owners, key=len, reverse=True)
+        )
+        return re.compile(f"(?=({alternation}))"), keyword_types
+    
+    def _init_trigger_re(self) -> re.Pattern:
+        """
+        Build one regex matching anything that could make a message a memory:
+        a type keyword, a time word or a negation word. A message it does not
+        match cannot produce a memory.
+        """
+        keywords = "|".join(
+            re.escape(keyword)
+            for config in self.patterns.values() for keyword in config["keywords"]
+        )
+        return re.compile(
+            f"{keywords}|{_TIME_WORDS_RE.pattern}|{_NEGATIVE_RE.pattern}"
+        )
     
     def extract_memory(self, message: str, turn: int, user_id: str = "default") -> Optional[Dict]:
         """
@@ -105,43 +238,58 @@ class MemoryExtractor:
         Returns:
             dict or None: Memory object if extracted, None otherwise
         """
+        classified = self._classify(message)
+        if classified is None:
+            return None
+        
+        mem_type, content, confidence = classified
+        return self._create_memory(mem_type, content, confidence, turn, user_id)
+    
+    def _classify_message(self, message: str) -> Optional[Tuple[str, str, float]]:
+        """
+        Decide the memory type, content and confidence for a message
+        Pure function of the message; cached per extractor as _classify
+        
+        Args:
+            message: User's message text
+            
+        Returns:
+            tuple or None: (type, content, confidence) if the message holds a memory
+        """
         msg_lower = message.lower().strip()
         
         # Skip very short messages
         if len(msg_lower) < 3:
             return None
         
-        # Try each memory type
+        # Skip chit-chat with nothing to remember before any per-type work
+        if not self._trigger_re.search(msg_lower):
+            return None
+        
+        # Find the types whose keywords appear, in one scan of the message
+        candidate_types: set = set()
+        for keyword in self._keyword_re.findall(msg_lower):
+            candidate_types |= self._keyword_types[keyword]
+        
+        # Try each candidate memory type, in priority order
         for mem_type, config in self.patterns.items():
-            # Check keywords first for efficiency
-            if any(keyword in msg_lower for keyword in config["keywords"]):
-                # Try regex patterns
-                for pattern in config["patterns"]:
-                    match = re.search(pattern, msg_lower, re.IGNORECASE)
-                    if match:
-                        content = self._clean_content(message)
-                        return self._create_memory(
-                            mem_type, 
-                            content, 
-                            config["confidence"], 
-                            turn, 
-                            user_id
-                        )
+            if mem_type in candidate_types and config["regex"].search(msg_lower):
+                return mem_type, self._clean_content(message), config["confidence"]
         
         # Check for time-based preferences
         if self._is_time_preference(msg_lower):
-            return self._create_memory("preference", message, 0.88, turn, user_id)
+            return "preference", message, 0.88
         
         # Check for negative constraints
         if self._is_negative_statement(msg_lower):
-            return self._create_memory("constraint", message, 0.85, turn, user_id)
+            return "constraint", message, 0.85
         
         return None
     
     def _clean_content(self, content: str) -> str:
         """Clean and normalize content"""
         # Remove extra whitespace
-        content = re.sub(r'\s+', ' ', content.strip())
+        content = _WHITESPACE_RE.sub(' ', content.strip())
         
         # Capitalize first letter
         if content:
@@ -155,23 +303,11 @@ class MemoryExtractor:
     
     def _is_time_preference(self, message: str) -> bool:
         """Check if message contains time-based preference"""
-        time_words = ['morning', 'afternoon', 'evening', 'night', 'am', 'pm',
-                     'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 
-                     'saturday', 'sunday', 'weekday', 'weekend']
-        
-        temporal_words = ['after', 'before', 'between', 'during', 'at', 'on']
-        
-        has_time = any(word in message for word in time_words)
-        has_temporal = any(word in message for word in temporal_words)
-        
-        return has_time and has_temporal
+        return bool(_TIME_WORDS_RE.search(message) and _TEMPORAL_RE.search(message))
     
     def _is_negative_statement(self, message: str) -> bool:
         """Check if message contains negative constraint"""
-        negative_words = ["don't", "do not", "never", "not", "won't", "will not",
-                         "can't", "cannot", "shouldn't", "should not"]
-        
-        return any(word in message for word in negative_words)
+        return bool(_NEGATIVE_RE.search(message))
     
     def _create_memory(self, mem_type: str, content: str, confidence: float, 
                       turn: int, user_id: str) -> Optional[Dict]:
@@ -189,7 +325,7 @@ class MemoryExtractor:
             dict or None: Memory object if valid, None otherwise
         """
         memory = {
-            "id": str(uuid.uuid4()),
+            "id": secrets.token_hex(16),
             "user_id": user_id,
             "type": mem_type,
             "content": content,
@@ -204,7 +340,7 @@ class MemoryExtractor:
         if is_valid:
             return memory
         
-        print(f"Invalid memory: {error}")
+        logger.debug("Invalid memory: %s", error)
         return None
     
     def extract_name(self, message: str) -> Optional[str]:
@@ -220,22 +356,21 @@ class MemoryExtractor:
         msg_lower = message.lower()
         
         # Pattern: "my name is X"
-        match = re.search(r"my name is\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)", msg_lower)
+        match = _NAME_IS_RE.search(msg_lower)
         if match:
             name = match.group(1)
             return self._capitalize_name(name)
         
         # Pattern: "i am X" (careful with false positives)
-        match = re.search(r"i(?:'m| am)\s+([a-zA-Z]+)(?:\s|$|\.)", msg_lower)
+        match = _I_AM_RE.search(msg_lower)
         if match:
             name = match.group(1)
             # Avoid common false positives
-            skip_words = {"a", "an", "the", "going", "working", "living", "from", "here"}
-            if name not in skip_words:
+            if name not in _NAME_SKIP_WORDS:
                 return self._capitalize_name(name)
         
         # Pattern: "call me X"
-        match = re.search(r"call me\s+([a-zA-Z]+)", msg_lower)
+        match = _CALL_ME_RE.search(msg_lower)
         if match:
             return self._capitalize_name(match.group(1))
         
@@ -255,19 +390,35 @@ class MemoryExtractor:
             user_id: User ID
             
         Returns:
-            List of extracted memories
+            List of extracted memories (distinct, at most MAX_MEMORIES_PER_MESSAGE)
         """
-        memories = []
+        memories: List[Dict] = []
+        seen = set()
         
         # Split by sentences
-        sentences = re.split(r'[.!?]+', message)
+        sentences = _SENTENCE_SPLIT_RE.split(message)
         
         for sentence in sentences:
             sentence = sentence.strip()
-            if len(sentence) > 3:
-                memory = self.extract_memory(sentence, turn, user_id)
-                if memory:
-                    memories.append(memory)
+            if len(sentence) <= 3:
+                continue
+            
+            classified = self._classify(sentence)
+            if classified is None:
+                continue
+            
+            # Repeated sentences yield the same memory; build it only once
+            mem_type, content, confidence = classified
+            key = (mem_type, content.lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            memory = self._create_memory(mem_type, content, confidence, turn, user_id)
+            if memory:
+                memories.append(memory)
+                if len(memories) >= MAX_MEMORIES_PER_MESSAGE:
+                    break
         
         return memories
 
@@ -0,0 +1,31 @@
+# backend/gunicorn.conf.py
+
+"""
+Gunicorn settings for serving the backend
+Run with: gunicorn app:app
+"""
+
+import multiprocessing
+import os
+
+from config import Config
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Pre-forked workers, each serving requests on MYSQL_POOL_SIZE threads; the
+# connection pool adds MAINTENANCE_WORKERS connections on top of these for
+# the background maintenance thread, so every thread can hold a connection
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = Config.MYSQL_POOL_SIZE
+
+timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    server.log.info("🧠 Memory Chatbot Backend Starting...")
+    server.log.info(f"🗄️ MySQL Database: {Config.MYSQL_DATABASE}")
+    server.log.info(f"🔐 Admin: {Config.ADMIN_USERNAME}")
+    server.log.info(f"🌐 CORS Origins: {Config.CORS_ORIGINS}")
+    server.log.info(f"🚀 Server running on http://{bind}")
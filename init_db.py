@@ -1,5 +1,41 @@
+from mysql.connector import errorcode, Error as MySQLError
 from database.db import get_connection
 
+# Indexes on memory, shaped after the store's queries
+MEMORY_INDEXES = (
+    # fetch_active: WHERE user_id, active ORDER BY confidence, last_used_turn
+    "CREATE INDEX idx_user_active_conf ON memory"
+    "(user_id, active, confidence DESC, last_used_turn DESC)",
+    # fetch_decayable: WHERE user_id, active AND last_used_turn <= cutoff
+    "CREATE INDEX idx_user_active_used ON memory(user_id, active, last_used_turn)",
+    # insert dedup: WHERE user_id, type, active
+    "CREATE INDEX idx_user_type ON memory(user_id, type, active)",
+    # fetch_matching: MATCH(content) AGAINST (...)
+    "CREATE FULLTEXT INDEX ft_content ON memory(content)",
+)
+
+# Earlier single-column indexes, superseded by the composites above
+OBSOLETE_INDEXES = ("idx_user_active", "idx_type", "idx_confidence", "idx_last_used")
+
+
+def _create_index(cursor, index_sql):
+    """CREATE INDEX that tolerates the index already existing (MySQL has no IF NOT EXISTS)"""
+    try:
+        cursor.execute(index_sql)
+    except MySQLError as e:
+        if e.errno != errorcode.ER_DUP_KEYNAME:
+            raise
+
+
+def _drop_index(cursor, name):
+    """DROP INDEX that tolerates the index being absent"""
+    try:
+        cursor.execute(f"DROP INDEX {name} ON memory")
+    except MySQLError as e:
+        if e.errno != errorcode.ER_CANT_DROP_FIELD_OR_KEY:
+            raise
+
+
 def init_db():
     conn = get_connection()
     cursor = conn.cursor()
@@ -22,21 +58,11 @@ def init_db():
     )
     """)
 
-    cursor.execute("""
-    CREATE INDEX idx_user_active ON memory(user_id, active)
-    """)
+    for index_sql in MEMORY_INDEXES:
+        _create_index(cursor, index_sql)
 
-    cursor.execute("""
-    CREATE INDEX idx_type ON memory(type)
-    """)
-
-    cursor.execute("""
-    CREATE INDEX idx_confidence ON memory(confidence)
-    """)
-
-    cursor.execute("""
-    CREATE INDEX idx_last_used ON memory(last_used_turn)
-    """)
+    for name in OBSOLETE_INDEXES:
+        _drop_index(cursor, name)
 
     # Memory History Table
     cursor.execute("""
@@ -5,8 +5,56 @@ Memory Injector - Enhanced context injection
 Injects relevant memories into LLM prompts with smart formatting
 """
 
+import io
+from bisect import bisect_right
 from typing import List, Dict, Optional
 
+# Priority order for types in injected context
+_TYPE_ORDER = ("fact", "preference", "constraint", "commitment", "goal", "relationship")
+_TYPE_INDEX = {mem_type: i for i, mem_type in enumerate(_TYPE_ORDER)}
+
+# Memory types included by inject_invisible, in output order
+_INVISIBLE_SECTIONS = (
+    ("fact", "User facts"),
+    ("preference", "User preferences"),
+    ("constraint", "User constraints"),
+)
+
+# Fixed framing of inject_detailed output
+_DETAILED_HEADER = (
+    "=== USER MEMORY CONTEXT ===\n"
+    "The following information has been remembered from previous conversations:\n"
+    "\n"
+)
+_DETAILED_FOOTER = (
+    "INSTRUCTIONS:\n"
+    "- Use this information naturally in your responses\n"
+    "- Don't explicitly mention that you're using stored memories\n"
+    "- Personalize your responses based on this context\n"
+    "=========================\n"
+)
+
+# Display titles per memory type
+_TYPE_TITLES = {
+    "fact": "📋 Facts About User",
+    "preference": "⭐ User Preferences",
+    "constraint": "🚫 User Boundaries",
+    "commitment": "📅 Pending Tasks",
+    "goal": "🎯 User Goals",
+    "relationship": "👥 Relationships"
+}
+
+# Confidence bands: a confidence c maps to LABELS[bisect_right(BANDS, c)],
+# so each band's lower bound is inclusive
+_INDICATOR_BANDS = (0.75, 0.85, 0.95)
+_CONFIDENCE_INDICATORS = ("○○○", "●○○", "●●○", "●●●")  # Low, medium, high, very high
+
+_EMOJI_BANDS = (0.8, 0.9)
+_CONFIDENCE_EMOJIS = ("🟠", "🟡", "🟢")  # Low, medium, high confidence
+
+_LEVEL_BANDS = (0.7, 0.8, 0.9)
+_CONFIDENCE_LEVELS = ("low", "moderate", "medium", "high")
+
 
 def inject_memory_context(memories: List[Dict], style: str = "detailed") -> str:
     """
@@ -40,41 +88,25 @@ def inject_detailed(memories: List[Dict]) -> str:
     Returns:
         str: Detailed formatted context
     """
-    context_lines = [
-        "=== USER MEMORY CONTEXT ===",
-        "The following information has been remembered from previous conversations:",
-        ""
-    ]
-    
-    # Group by type for cleaner presentation
-    by_type = _group_by_type(memories)
+    buf = io.StringIO()
+    write = buf.write
+    write(_DETAILED_HEADER)
     
-    # Priority order for types
-    type_order = ["fact", "preference", "constraint", "commitment", "goal", "relationship"]
-    
-    for mem_type in type_order:
-        if mem_type not in by_type:
+    # Group by type for cleaner presentation, in priority order
+    for mem_type, bucket in zip(_TYPE_ORDER, _bucket_by_type_order(memories)):
+        if not bucket:
             continue
         
-        type_title = _get_type_title(mem_type)
-        context_lines.append(f"{type_title}:")
-        
-        for mem in by_type[mem_type]:
-            confidence_indicator = _get_confidence_indicator(mem['confidence'])
-            context_lines.append(f"  {confidence_indicator} {mem['content']}")
-        
-        context_lines.append("")
+        write(f"{_get_type_title(mem_type)}:\n")
+        buf.writelines(
+            f"  {_get_confidence_indicator(mem['confidence'])} {mem['content']}\n"
+            for mem in bucket
+        )
+        write("\n")
     
-    context_lines.extend([
-        "INSTRUCTIONS:",
-        "- Use this information naturally in your responses",
-        "- Don't explicitly mention that you're using stored memories",
-        "- Personalize your responses based on this context",
-        "=========================",
-        ""
-    ])
+    write(_DETAILED_FOOTER)
     
-    return "\n".join(context_lines)
+    return buf.getvalue()
 
 
 def inject_concise(memories: List[Dict]) -> str:
@@ -114,31 +146,12 @@ def inject_invisible(memories: List[Dict]) -> str:
         return ""
     
     # Extract key information
-    facts = []
-    preferences = []
-    constraints = []
-    
-    for mem in memories:
-        mem_type = mem['type']
-        content = mem['content']
-        
-        if mem_type == "fact":
-            facts.append(content)
-        elif mem_type == "preference":
-            preferences.append(content)
-        elif mem_type == "constraint":
-            constraints.append(content)
-    
-    parts = []
-    
-    if facts:
-        parts.append("User facts: " + "; ".join(facts))
-    
-    if preferences:
-        parts.append("User preferences: " + "; ".join(preferences))
+    buckets = _bucket_by_type_order(memories)
     
-    if constraints:
-        parts.append("User constraints: " + "; ".join(constraints))
+    parts = [
+        f"{label}: " + "; ".join(mem['content'] for mem in buckets[_TYPE_INDEX[mem_type]])
+        for mem_type, label in _INVISIBLE_SECTIONS if buckets[_TYPE_INDEX[mem_type]]
+    ]
     
     return ". ".join(parts) + "."
 
@@ -156,11 +169,10 @@ def inject_simple(memories: List[Dict]) -> str:
     if not memories:
         return ""
     
-    context = "Remembered information:\n"
-    for mem in memories:
-        context += f"- {mem['content']}\n"
+    parts = ["Remembered information:\n"]
+    parts.extend(f"- {mem['content']}\n" for mem in memories)
     
-    return context
+    return "".join(parts)
 
 
 def inject_for_llm(memories: List[Dict], query: str = "") -> str:
@@ -179,21 +191,22 @@ def inject_for_llm(memories: List[Dict], query: str = "") -> str:
     
     # Sort by relevance (already done in retrieval)
     context_parts = []
+    buckets = _bucket_by_type_order(memories)
     
     # Add high-confidence facts first
-    facts = [m for m in memories if m['type'] == 'fact' and m['confidence'] > 0.9]
+    facts = [m for m in buckets[_TYPE_INDEX['fact']] if m['confidence'] > 0.9]
     if facts:
         fact_text = ", ".join([m['content'] for m in facts[:2]])
         context_parts.append(f"Known facts: {fact_text}")
     
     # Add relevant preferences
-    preferences = [m for m in memories if m['type'] == 'preference']
+    preferences = buckets[_TYPE_INDEX['preference']]
     if preferences:
         pref_text = ", ".join([m['content'] for m in preferences[:2]])
         context_parts.append(f"User preferences: {pref_text}")
     
     # Add constraints
-    constraints = [m for m in memories if m['type'] == 'constraint']
+    constraints = buckets[_TYPE_INDEX['constraint']]
     if constraints:
         const_text = ", ".join([m['content'] for m in constraints[:2]])
         context_parts.append(f"User boundaries: {const_text}")
@@ -222,15 +235,17 @@ def get_memory_summary(memories: List[Dict]) -> Dict:
             "high_confidence_count": 0
         }
     
-    by_type = _group_by_type(memories)
-    high_confidence = len([m for m in memories if m["confidence"] > 0.9])
+    by_type, confidence_sum, high_confidence = _summarize(memories)
+    avg_confidence = confidence_sum / len(memories)
     
     return {
         "total": len(memories),
         "by_type": {k: len(v) for k, v in by_type.items()},
-        "avg_confidence": sum(m["confidence"] for m in memories) / len(memories),
+        "avg_confidence": avg_confidence,
         "high_confidence_count": high_confidence,
-        "memory_quality": _assess_memory_quality(memories)
+        "memory_quality": _quality_level(
+            avg_confidence, high_confidence / len(memories)
+        )
     }
 
 
@@ -276,87 +291,88 @@ def create_memory_card(memory: Dict) -> Dict:
     Returns:
         Dict with formatted fields
     """
+    mem_type = memory['type']
+    confidence = memory['confidence']
+    relevance = memory.get('relevance')
+    
     return {
         "id": memory['id'],
-        "type": memory['type'],
-        "type_display": memory['type'].capitalize(),
+        "type": mem_type,
+        "type_display": mem_type.capitalize(),
         "content": memory['content'],
-        "confidence": round(memory['confidence'], 2),
-        "confidence_display": f"{round(memory['confidence'] * 100)}%",
-        "confidence_level": _get_confidence_level(memory['confidence']),
-        "relevance": round(memory.get('relevance', 0), 2) if 'relevance' in memory else None,
+        "confidence": round(confidence, 2),
+        "confidence_display": f"{round(confidence * 100)}%",
+        "confidence_level": _get_confidence_level(confidence),
+        "relevance": round(relevance, 2) if relevance is not None else None,
         "age": memory.get('created_turn', 0),
         "last_used": memory.get('last_used_turn', 0),
         "use_count": memory.get('use_count', 1)
     }
 
 
-def _group_by_type(memories: List[Dict]) -> Dict[str, List[Dict]]:
+def _bucket_by_type_order(memories: List[Dict]) -> List[List[Dict]]:
     """
-    Group memories by type
+    Group memories into one list per _TYPE_ORDER position
+    Memories of other types are left out
     
     Args:
         memories: List of memory dictionaries
         
     Returns:
-        dict: Memories grouped by type
+        List of memory lists, parallel to _TYPE_ORDER
+    """
+    buckets = [[] for _ in _TYPE_ORDER]
+    
+    for mem in memories:
+        i = _TYPE_INDEX.get(mem["type"])
+        if i is not None:
+            buckets[i].append(mem)
+    
+    return buckets
+
+
+def _summarize(memories: List[Dict]) -> tuple:
+    """
+    Group memories by type and total their confidences in one pass
+    
+    Args:
+        memories: List of memory dictionaries
+        
+    Returns:
+        tuple: (memories grouped by type, confidence sum, count above 0.9)
     """
     grouped = {}
+    confidence_sum = 0.0
+    high_confidence = 0
     
     for mem in memories:
-        mem_type = mem["type"]
-        if mem_type not in grouped:
-            grouped[mem_type] = []
-        grouped[mem_type].append(mem)
+        grouped.setdefault(mem["type"], []).append(mem)
+        confidence = mem["confidence"]
+        confidence_sum += confidence
+        if confidence > 0.9:
+            high_confidence += 1
     
-    return grouped
+    return grouped, confidence_sum, high_confidence
 
 
 def _get_type_title(mem_type: str) -> str:
     """Get display title for memory type"""
-    titles = {
-        "fact": "📋 Facts About User",
-        "preference": "⭐ User Preferences",
-        "constraint": "🚫 User Boundaries",
-        "commitment": "📅 Pending Tasks",
-        "goal": "🎯 User Goals",
-        "relationship": "👥 Relationships"
-    }
-    return titles.get(mem_type, mem_type.capitalize())
+    return _TYPE_TITLES.get(mem_type) or mem_type.capitalize()
 
 
 def _get_confidence_indicator(confidence: float) -> str:
     """Get visual indicator for confidence level"""
-    if confidence >= 0.95:
-        return "●●●"  # Very high
-    elif confidence >= 0.85:
-        return "●●○"  # High
-    elif confidence >= 0.75:
-        return "●○○"  # Medium
-    else:
-        return "○○○"  # Low
+    return _CONFIDENCE_INDICATORS[bisect_right(_INDICATOR_BANDS, confidence)]
 
 
 def _get_confidence_emoji(confidence: float) -> str:
     """Get emoji for confidence level"""
-    if confidence >= 0.9:
-        return "🟢"  # High confidence
-    elif confidence >= 0.8:
-        return "🟡"  # Medium confidence
-    else:
-        return "🟠"  # Low confidence
+    return _CONFIDENCE_EMOJIS[bisect_right(_EMOJI_BANDS, confidence)]
 
 
 def _get_confidence_level(confidence: float) -> str:
     """Get text description of confidence level"""
-    if confidence >= 0.9:
-        return "high"
-    elif confidence >= 0.8:
-        return "medium"
-    elif confidence >= 0.7:
-        return "moderate"
-    else:
-        return "low"
+    return _CONFIDENCE_LEVELS[bisect_right(_LEVEL_BANDS, confidence)]
 
 
 def _assess_memory_quality(memories: List[Dict]) -> str:
@@ -372,9 +388,15 @@ def _assess_memory_quality(memories: List[Dict]) -> str:
     if not memories:
         return "none"
     
-    avg_confidence = sum(m['confidence'] for m in memories) / len(memories)
-    high_conf_ratio = len([m for m in memories if m['confidence'] > 0.9]) / len(memories)
+    _, confidence_sum, high_confidence = _summarize(memories)
     
+    return _quality_level(
+        confidence_sum / len(memories), high_confidence / len(memories)
+    )
+
+
+def _quality_level(avg_confidence: float, high_conf_ratio: float) -> str:
+    """Quality label from average confidence and share of high-confidence memories"""
     if avg_confidence > 0.9 and high_conf_ratio > 0.5:
         return "excellent"
     elif avg_confidence > 0.85:
@@ -5,9 +5,46 @@ Memory Retrieval - Enhanced contextual recall system
 Retrieves relevant memories using semantic matching and ranking
 """
 
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, NamedTuple, Tuple, Optional
+import functools
+import heapq
+import operator
 import re
-from collections import Counter
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Common words ignored when matching queries against memories
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
+    'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
+    'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'what', 'which',
+    'who', 'when', 'where', 'why', 'how', 'all', 'each', 'every', 'both',
+    'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not',
+    'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'my'
+})
+
+_TOKEN_RE = re.compile(r'\b\w+\b')
+_ENTITY_RE = re.compile(r'\b[A-Z][a-z]+\b')
+# "my name is X [Y]" (any case) or "I am X" (X capitalized)
+_NAME_RE = re.compile(
+    r"(?i:my name is)\s+(?P<full>[a-zA-Z]+(?:\s+[a-zA-Z]+)?)"
+    r"|\bi(?:'m| am)\s+(?P<short>[A-Z][a-z]+)"
+)
+_NOT_NAMES = frozenset({"Going", "Working", "Living", "From"})
+
+# Relevance multiplier per memory type
+_TYPE_RELEVANCE_WEIGHTS = {
+    "fact": 1.2,       # Facts are often directly relevant
+    "preference": 1.1,
+    "constraint": 1.15,
+    "commitment": 0.9,
+    "goal": 1.0,
+    "relationship": 1.0
+}
 
 
 def retrieve_relevant(query: str, memories: List[tuple], top_k: int = 5, 
@@ -25,72 +62,278 @@ def retrieve_relevant(query: str, memories: List[tuple], top_k: int = 5,
     Returns:
         List of relevant memory dictionaries
     """
-    if not memories:
+    if not memories or top_k <= 0:
         return []
     
     query_lower = query.lower()
-    query_words = _tokenize(query_lower)
-    
-    # Remove common stop words
-    query_words = _remove_stop_words(query_words)
+    query_words = _keywords(query_lower)
     
     if not query_words:
         return []
     
-    scored_memories = []
+    # Query-side terms are the same for every memory
+    query_terms = _query_terms(query_lower, query_words)
     
+    # Score into (relevance, confidence, row) and only build result
+    # dicts for the top_k survivors
+    scored = []
+    # Min-heap of the best top_k scores so far; its root is the bar a
+    # memory must reach to still make the cut
+    best_scores = []
     for mem in memories:
-        mem_id = mem[0]
-        mem_type = mem[1]
-        content = mem[2]
-        confidence = mem[3]
-        created_turn = mem[4]
-        last_used = mem[5]
-        use_count = mem[6] if len(mem) > 6 else 1
-        
-        content_lower = content.lower()
-        content_words = _tokenize(content_lower)
-        content_words = _remove_stop_words(content_words)
+        content_terms = _content_terms(mem.content)
+        
+        # Skip full scoring when even the best case can't reach the bar
+        if len(best_scores) == top_k and _relevance_upper_bound(
+                query_terms, content_terms, mem.confidence,
+                mem.type, mem.use_count) < best_scores[0]:
+            continue
         
         # Calculate relevance score
         score = _calculate_enhanced_relevance(
-            query_words, content_words, confidence, 
-            mem_type, use_count, query_lower, content_lower
+            query_terms, content_terms, mem.confidence, 
+            mem.type, mem.use_count
         )
         
         if score > min_score:
-            scored_memories.append({
-                "id": mem_id,
-                "type": mem_type,
-                "content": content,
-                "confidence": confidence,
-                "relevance": score,
-                "created_turn": created_turn,
-                "last_used_turn": last_used,
-                "use_count": use_count
-            })
+            scored.append((score, mem.confidence, mem))
+            if len(best_scores) < top_k:
+                heapq.heappush(best_scores, score)
+            else:
+                heapq.heappushpop(best_scores, score)
+    
+    # Top by relevance, then confidence
+    top = heapq.nlargest(top_k, scored, key=operator.itemgetter(0, 1))
+    
+    return [_to_dict(mem, relevance=score) for score, _, mem in top]
+
+
+class RelevanceCache:
+    """
+    Per-user cache of retrieve_relevant results for near-repeat queries
+    
+    A query reuses a recent result when its keywords overlap a cached
+    query's keywords by at least `threshold` (Jaccard) and the user's set
+    of active memories is unchanged; callers invalidate a user when they
+    add memories. Live fields (confidence, usage) are refreshed from the
+    current memories; relevance and order are reused, since each turn's
+    decay and boosts move them only slightly. At most `max_users` users
+    are kept, least recently used evicted first.
+    """
+    
+    def __init__(self, threshold: float = 0.85, ttl: float = 300.0,
+                 max_entries: int = 64, max_users: int = 1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def retrieve(self, user_id: str, query: str, memories: List[tuple],
+                 top_k: int = 5, min_score: float = 0.0) -> List[dict]:
+        """
+        Cached equivalent of retrieve_relevant
+        
+        Args:
+            user_id: User identifier
+            query: Current user message
+            memories: List of active memories
+            top_k: Maximum number of memories to return
+            min_score: Minimum relevance score to include
+            
+        Returns:
+            List of relevant memory dictionaries
+        """
+        query_words = frozenset(extract_keywords(query))
+        if not query_words or not memories:
+            return retrieve_relevant(query, memories, top_k, min_score)
+        
+        # Type and content are fixed for a given id, and deactivation
+        # drops the id, so the id set covers everything but live fields
+        memory_ids = frozenset(mem.id for mem in memories)
+        now = time.monotonic()
+        
+        with self._lock:
+            cached = self._lookup(user_id, memory_ids, query_words,
+                                  top_k, min_score, now)
+        
+        if cached is not None:
+            rows = {mem.id: mem for mem in memories}
+            results = []
+            for result in cached:
+                mem = rows[result["id"]]
+                results.append(dict(
+                    result,
+                    confidence=mem.confidence,
+                    last_used_turn=mem.last_used_turn,
+                    use_count=mem.use_count
+                ))
+            return results
+        
+        results = retrieve_relevant(query, memories, top_k, min_score)
+        
+        with self._lock:
+            self._store(user_id, memory_ids, query_words,
+                        top_k, min_score, now, results)
+        
+        return results
     
-    # Sort by relevance, then confidence
-    scored_memories.sort(key=lambda x: (x["relevance"], x["confidence"]), reverse=True)
+    def invalidate(self, user_id: str):
+        """Drop all cached results for a user"""
+        with self._lock:
+            self._users.pop(user_id, None)
     
-    return scored_memories[:top_k]
+    def _lookup(self, user_id, memory_ids, query_words, top_k, min_score, now):
+        cached = self._users.get(user_id)
+        if cached is None or cached[0] != memory_ids:
+            return None
+        
+        self._users.move_to_end(user_id)
+        entries = cached[1]
+        for key, (expires, results) in list(entries.items()):
+            if expires < now:
+                del entries[key]
+                continue
+            
+            words, k, score = key
+            if k != top_k or score != min_score:
+                continue
+            
+            overlap = len(words & query_words)
+            similarity = overlap / (len(words) + len(query_words) - overlap)
+            if similarity >= self.threshold:
+                entries.move_to_end(key)
+                return results
+        
+        return None
+    
+    def _store(self, user_id, memory_ids, query_words, top_k, min_score,
+               now, results):
+        cached = self._users.get(user_id)
+        if cached is None or cached[0] != memory_ids:
+            cached = (memory_ids, OrderedDict())
+            self._users[user_id] = cached
+        
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        
+        entries = cached[1]
+        entries[(query_words, top_k, min_score)] = (now + self.ttl, results)
+        entries.move_to_end((query_words, top_k, min_score))
+        
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+
+def _to_dict(mem, **extra) -> dict:
+    """
+    Result dict for a memory row
+    
+    Args:
+        mem: Memory row (id, type, content, confidence, created_turn,
+             last_used_turn, use_count)
+        **extra: Additional keys, e.g. relevance
+        
+    Returns:
+        Memory dictionary
+    """
+    result = {
+        "id": mem.id,
+        "type": mem.type,
+        "content": mem.content,
+        "confidence": mem.confidence,
+        "created_turn": mem.created_turn,
+        "last_used_turn": mem.last_used_turn,
+        "use_count": mem.use_count
+    }
+    result.update(extra)
+    return result
 
 
 def _tokenize(text: str) -> List[str]:
     """
-    Tokenize text into words
+    Tokenize lowercased text into words
     
     Args:
-        text: Input text
+        text: Lowercased input text
         
     Returns:
         List of tokens
     """
-    # Split on whitespace and punctuation
-    tokens = re.findall(r'\b\w+\b', text.lower())
+    # Split on whitespace and punctuation; interned so set lookups between
+    # query and memory tokens compare by identity
+    tokens = list(map(sys.intern, _TOKEN_RE.findall(text)))
     return tokens
 
 
+def _keywords(text: str) -> List[str]:
+    """
+    Tokenize lowercased text, dropping stop words in the same pass
+    
+    Args:
+        text: Lowercased input text
+        
+    Returns:
+        List of non-stop-word tokens
+    """
+    return [sys.intern(w) for w in _TOKEN_RE.findall(text)
+            if len(w) > 2 and w not in STOP_WORDS]
+
+
+def _term_frequencies(words: List[str]) -> Dict[str, float]:
+    """
+    Relative frequency of each word
+    
+    Args:
+        words: List of tokens
+        
+    Returns:
+        Dict of word -> count / len(words)
+    """
+    counts = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    
+    total = len(words)
+    return {word: count / total for word, count in counts.items()}
+
+
+class _ContentTerms(NamedTuple):
+    """Memory-side inputs to relevance scoring, computed once per content"""
+    text: str
+    words: Tuple[str, ...]
+    word_set: frozenset
+    tf: Dict[str, float]
+    bigrams: frozenset
+
+
+@functools.lru_cache(maxsize=4096)
+def _content_terms(content: str) -> _ContentTerms:
+    """
+    Lowercased content with its stop-word-filtered tokens, token set and
+    counts, cached by content since memories rarely change between queries
+    
+    Args:
+        content: Memory content
+        
+    Returns:
+        _ContentTerms for _calculate_enhanced_relevance
+    """
+    content_lower = content.lower()
+    tokens = _tokenize(content_lower)
+    words = tuple(_remove_stop_words(tokens))
+    return _ContentTerms(
+        text=content_lower,
+        words=words,
+        word_set=frozenset(words),
+        tf=_term_frequencies(words),
+        # Adjacent word pairs of the full text, for phrase matching
+        bigrams=frozenset(zip(tokens, tokens[1:]))
+    )
+
+
 def _remove_stop_words(words: List[str]) -> List[str]:
     """
     Remove common stop words
@@ -101,88 +344,155 @@ def _remove_stop_words(words: List[str]) -> List[str]:
     Returns:
         Filtered list
     """
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
-        'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-        'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
-        'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'what', 'which',
-        'who', 'when', 'where', 'why', 'how', 'all', 'each', 'every', 'both',
-        'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not',
-        'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'my'
-    }
+    return [w for w in words if len(w) > 2 and w not in STOP_WORDS]
+
+
+def extract_keywords(text: str) -> set:
+    """
+    Distinct non-stop-word tokens of a message
     
-    return [w for w in words if w not in stop_words and len(w) > 2]
+    Args:
+        text: Input text
+        
+    Returns:
+        Set of lowercase keywords
+    """
+    return set(_keywords(text.lower()))
+
+
+class _QueryTerms(NamedTuple):
+    """Query-side inputs to relevance scoring, computed once per query"""
+    words: List[str]
+    word_set: frozenset
+    tf: Dict[str, float]
+    bigrams: List[Tuple[str, str]]
+    entities: frozenset
+    max_phrase_bonus: float
 
 
-def _calculate_enhanced_relevance(query_words: List[str], content_words: List[str],
-                                  confidence: float, mem_type: str, use_count: int,
-                                  query_text: str, content_text: str) -> float:
+def _query_terms(query_text: str, query_words: List[str]) -> _QueryTerms:
     """
-    Calculate enhanced relevance score
+    Precompute everything about the query that scoring each memory needs
     
     Args:
+        query_text: Original query text
         query_words: Query tokens
-        content_words: Content tokens
+        
+    Returns:
+        _QueryTerms for _calculate_enhanced_relevance
+    """
+    # Phrase bonus only applies to queries of 3+ words
+    bigrams = []
+    if len(query_words) >= 3:
+        bigrams = list(zip(query_words, query_words[1:]))
+    
+    # Summed the same way as in scoring, so the bound is never below it
+    max_phrase_bonus = 0
+    for _ in bigrams:
+        max_phrase_bonus += 0.2
+    
+    return _QueryTerms(
+        words=query_words,
+        word_set=frozenset(query_words),
+        tf=_term_frequencies(query_words),
+        bigrams=bigrams,
+        entities=frozenset(_ENTITY_RE.findall(query_text)),
+        max_phrase_bonus=max_phrase_bonus
+    )
+
+
+def _relevance_upper_bound(query: _QueryTerms, content: _ContentTerms,
+                           confidence: float, mem_type: str,
+                           use_count: int) -> float:
+    """
+    Cheap upper bound on _calculate_enhanced_relevance, from set sizes only
+    
+    Args:
+        query: Precomputed query terms
+        content: Precomputed content terms
         confidence: Memory confidence
         mem_type: Memory type
         use_count: How many times memory was used
-        query_text: Original query text
-        content_text: Original content text
         
     Returns:
-        float: Relevance score
+        float: Score the memory cannot exceed
     """
-    if not query_words or not content_words:
-        return 0.0
+    query_size = len(query.word_set)
+    content_size = len(content.word_set)
     
-    # 1. Word overlap score (Jaccard similarity)
-    query_set = set(query_words)
-    content_set = set(content_words)
+    # Jaccard is at most min/max set size; TF products sum to at most 1;
+    # every bigram and entity matching is the best case for the bonuses
+    jaccard_bound = min(query_size, content_size) / max(query_size, content_size)
+    base_bound = (jaccard_bound * 0.4 + 0.4 + query.max_phrase_bonus
+                  + len(query.entities) * 0.3)
     
-    intersection = query_set & content_set
-    union = query_set | content_set
+    type_weight = _TYPE_RELEVANCE_WEIGHTS.get(mem_type, 1.0)
+    usage_bonus = min(0.2, use_count * 0.02)
+    
+    return min(1.0, base_bound * type_weight * confidence + usage_bonus)
+
+
+def _calculate_enhanced_relevance(query: _QueryTerms, content: _ContentTerms,
+                                  confidence: float, mem_type: str,
+                                  use_count: int) -> float:
+    """
+    Calculate enhanced relevance score
     
-    jaccard = len(intersection) / len(union) if union else 0
+    Args:
+        query: Precomputed query terms
+        content: Precomputed content terms
+        confidence: Memory confidence
+        mem_type: Memory type
+        use_count: How many times memory was used
+        
+    Returns:
+        float: Relevance score
+    """
+    query_words = query.words
+    content_words = content.words
+    content_text = content.text
+    if not query_words or not content_words:
+        return 0.0
     
-    # 2. TF-IDF weighted score
-    query_counter = Counter(query_words)
-    content_counter = Counter(content_words)
+    query_set = query.word_set
+    content_set = content.word_set
     
-    # Calculate term frequency
+    # Overlap and term-frequency scores are zero when no word is shared,
+    # which is most memories for a given query
+    jaccard = 0
     tf_score = 0
-    for word in intersection:
-        query_tf = query_counter[word] / len(query_words)
-        content_tf = content_counter[word] / len(content_words)
-        tf_score += query_tf * content_tf
+    if not query_set.isdisjoint(content_set):
+        # 1. Word overlap score (Jaccard similarity)
+        intersection = query_set & content_set
+        overlap = len(intersection)
+        
+        # |A ∪ B| = |A| + |B| - |A ∩ B|; both sets are non-empty here
+        jaccard = overlap / (len(query_set) + len(content_set) - overlap)
+        
+        # 2. TF-IDF weighted score
+        query_tf = query.tf
+        content_tf = content.tf
+        
+        # Term frequencies are precomputed on both sides
+        for word in intersection:
+            tf_score += query_tf[word] * content_tf[word]
     
     # 3. Exact phrase matching bonus
+    # Whole-word pairs only, so "at he" no longer matches inside "gather"
     phrase_bonus = 0
-    if len(query_words) >= 3:
-        # Check for 2-3 word phrases
-        for i in range(len(query_words) - 1):
-            bigram = f"{query_words[i]} {query_words[i+1]}"
-            if bigram in content_text:
-                phrase_bonus += 0.2
+    for bigram in query.bigrams:
+        if bigram in content.bigrams:
+            phrase_bonus += 0.2
     
     # 4. Named entity matching bonus
     # Check for capitalized words (potential names, places)
-    query_entities = re.findall(r'\b[A-Z][a-z]+\b', query_text)
-    content_entities = re.findall(r'\b[A-Z][a-z]+\b', content_text)
-    
-    entity_overlap = len(set(query_entities) & set(content_entities))
-    entity_bonus = entity_overlap * 0.3
+    entity_bonus = 0
+    if query.entities:
+        content_entities = _ENTITY_RE.findall(content_text)
+        entity_bonus = len(query.entities.intersection(content_entities)) * 0.3
     
     # 5. Memory type relevance
-    type_weights = {
-        "fact": 1.2,       # Facts are often directly relevant
-        "preference": 1.1,
-        "constraint": 1.15,
-        "commitment": 0.9,
-        "goal": 1.0,
-        "relationship": 1.0
-    }
-    type_weight = type_weights.get(mem_type, 1.0)
+    type_weight = _TYPE_RELEVANCE_WEIGHTS.get(mem_type, 1.0)
     
     # 6. Usage frequency bonus (frequently accessed = more important)
     usage_bonus = min(0.2, use_count * 0.02)
@@ -206,22 +516,7 @@ def retrieve_by_type(memories: List[tuple], mem_type: str) -> List[dict]:
     Returns:
         List of filtered memories
     """
-    filtered = []
-    
-    for mem in memories:
-        mem_id, m_type, content, confidence, created_turn, last_used = mem[:6]
-        use_count = mem[6] if len(mem) > 6 else 1
-        
-        if m_type == mem_type:
-            filtered.append({
-                "id": mem_id,
-                "type": m_type,
-                "content": content,
-                "confidence": confidence,
-                "created_turn": created_turn,
-                "last_used_turn": last_used,
-                "use_count": use_count
-            })
+    filtered = [_to_dict(mem) for mem in memories if mem.type == mem_type]
     
     # Sort by confidence
     filtered.sort(key=lambda x: x["confidence"], reverse=True)
@@ -240,26 +535,10 @@ def retrieve_recent(memories: List[tuple], n: int = 5) -> List[dict]:
     Returns:
         List of recent memories
     """
-    # Convert to dicts
-    mem_dicts = []
-    for mem in memories:
-        mem_id, mem_type, content, confidence, created_turn, last_used = mem[:6]
-        use_count = mem[6] if len(mem) > 6 else 1
-        
-        mem_dicts.append({
-            "id": mem_id,
-            "type": mem_type,
-            "content": content,
-            "confidence": confidence,
-            "created_turn": created_turn,
-            "last_used_turn": last_used,
-            "use_count": use_count
-        })
+    # Pick the most recent by last_used_turn, then convert only those
+    recent = heapq.nlargest(n, memories, key=operator.attrgetter("last_used_turn"))
     
-    # Sort by last_used_turn
-    mem_dicts.sort(key=lambda x: x["last_used_turn"], reverse=True)
-    
-    return mem_dicts[:n]
+    return [_to_dict(mem) for mem in recent]
 
 
 def get_user_name(memories: List[tuple]) -> str:
@@ -273,23 +552,21 @@ def get_user_name(memories: List[tuple]) -> str:
         str: User's name or "User"
     """
     for mem in memories:
-        _, mem_type, content, _, _, _ = mem[:6]
-        
-        if mem_type == "fact" and "my name is" in content.lower():
-            # Extract name
-            match = re.search(r"my name is\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)", content, re.IGNORECASE)
-            if match:
-                name = match.group(1)
-                return name.strip()
-        
-        # Also check "I am [Name]" pattern
-        if mem_type == "fact" and re.search(r"i(?:'m| am)\s+([A-Z][a-z]+)", content):
-            match = re.search(r"i(?:'m| am)\s+([A-Z][a-z]+)", content)
-            if match:
-                potential_name = match.group(1)
-                # Verify it's likely a name (capitalized, not a common word)
-                if potential_name not in ["Going", "Working", "Living", "From"]:
-                    return potential_name
+        if mem.type != "fact":
+            continue
+        
+        match = _NAME_RE.search(mem.content)
+        if match is None:
+            continue
+        
+        name = match.group("full")
+        if name:
+            return name.strip()
+        
+        # "I am [Name]": verify it's likely a name, not a common word
+        potential_name = match.group("short")
+        if potential_name not in _NOT_NAMES:
+            return potential_name
     
     return "User"
 
@@ -362,22 +639,11 @@ def search_memories(memories: List[tuple], search_term: str) -> List[dict]:
         List of matching memories
     """
     search_lower = search_term.lower()
-    results = []
-    
-    for mem in memories:
-        mem_id, mem_type, content, confidence, created_turn, last_used = mem[:6]
-        use_count = mem[6] if len(mem) > 6 else 1
-        
-        if search_lower in content.lower():
-            results.append({
-                "id": mem_id,
-                "type": mem_type,
-                "content": content,
-                "confidence": confidence,
-                "created_turn": created_turn,
-                "last_used_turn": last_used,
-                "use_count": use_count
-            })
+    # Lowercased content is cached with the memory's scoring terms
+    results = [
+        _to_dict(mem) for mem in memories
+        if search_lower in _content_terms(mem.content).text
+    ]
     
     # Sort by confidence
     results.sort(key=lambda x: x["confidence"], reverse=True)
@@ -395,14 +661,18 @@ def get_memory_context_summary(memories: List[tuple]) -> Dict[str, any]:
     Returns:
         Dictionary with context summary
     """
+    # Count types in one pass instead of filtering the list per type
+    type_counts = Counter(mem.type for mem in memories)
+    recent = heapq.nlargest(3, memories, key=operator.attrgetter("last_used_turn"))
+    
     summary = {
         "user_name": get_user_name(memories),
         "total_memories": len(memories),
-        "preferences": len(retrieve_by_type(memories, "preference")),
-        "facts": len(retrieve_by_type(memories, "fact")),
-        "constraints": len(retrieve_by_type(memories, "constraint")),
-        "commitments": len(retrieve_by_type(memories, "commitment")),
-        "recent_memories": [m["content"] for m in retrieve_recent(memories, 3)]
+        "preferences": type_counts["preference"],
+        "facts": type_counts["fact"],
+        "constraints": type_counts["constraint"],
+        "commitments": type_counts["commitment"],
+        "recent_memories": [mem.content for mem in recent]
     }
     
     return summary
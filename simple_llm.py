@@ -6,17 +6,100 @@ Better pattern matching and context-aware responses
 Can be easily replaced with real LLM API
 """
 
+import functools
 import random
 import re
 from typing import Dict, List, Optional
 
 
+def _compile_in_order(patterns: List[str]) -> re.Pattern:
+    """
+    Combine patterns (one capture group each) into a single regex for
+    re.match that behaves like trying re.search with each in turn: an
+    alternative is only tried if no earlier one matches anywhere
+    
+    Args:
+        patterns: Regex strings, highest priority first
+        
+    Returns:
+        Compiled pattern; the match's lastindex is the group that matched
+    """
+    return re.compile("|".join(f"(?s:.*?){p}" for p in patterns))
+
+
+def _compile_keywords(keywords: List[str]) -> re.Pattern:
+    """Single regex that finds any of the keywords as a substring"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+@functools.lru_cache(maxsize=None)
+def _context_item_re(keyword: str) -> re.Pattern:
+    """
+    Regex over a whole context that captures, for every line containing
+    keyword (any case) and a dash, the text after the line's first dash
+    
+    Args:
+        keyword: Word the line must contain
+        
+    Returns:
+        Compiled pattern for findall
+    """
+    return re.compile(
+        rf"^(?=[^\n]*{re.escape(keyword)})[^\n-]*-([^\n]*)$",
+        re.IGNORECASE | re.MULTILINE
+    )
+
+
+# Field extraction patterns, by priority, against lowercased content
+_PREFERENCE_SUBJECT_RE = _compile_in_order([
+    r"(?:prefer|like|love|enjoy)\s+(\w+)",
+    r"favorite\s+(\w+)",
+])
+_TASK_RE = _compile_in_order([
+    r"remind me (?:to|about)\s+(.+)",
+    r"(?:need|have) to\s+(.+)",
+    r"(?:schedule|book)\s+(.+)",
+])
+_GOAL_RE = _compile_in_order([
+    r"want to\s+(.+)",
+    r"goal (?:is|:)\s+(.+)",
+    r"(?:trying|planning|hoping) to\s+(.+)",
+])
+
+# Message triggers, matched anywhere in the lowercased message
+_SCHEDULING_RE = _compile_keywords([
+    "meeting", "schedule", "call", "appointment",
+    "book", "plan", "calendar", "reminder"
+])
+_GOODBYE_RE = _compile_keywords(["bye", "goodbye", "see you", "farewell", "later", "take care"])
+_NAME_INTRO_RE = _compile_keywords(["i am ", "i'm ", "call me ", "this is "])
+
+# Question topics, checked in order by _handle_question
+_NAME_QUERY_RE = _compile_keywords(["my name", "who am i"])
+_PREFERENCE_QUERY_RE = _compile_keywords(["prefer", "like", "favorite", "love"])
+_TIME_QUERY_RE = _compile_keywords(["when", "time", "schedule"])
+_TASK_QUERY_RE = _compile_keywords(["task", "todo", "remind", "commitment"])
+
+# Message openers; str.startswith checks the whole tuple in one call
+_GREETING_PREFIXES = ("hi", "hello", "hey", "greetings", "good morning",
+                      "good afternoon", "good evening", "howdy", "sup", "yo")
+_QUESTION_PREFIXES = ("what", "when", "where", "who", "why", "how", "can you",
+                      "could you", "would you", "do you", "are you", "is there")
+
+
 class SimpleLLM:
     """Enhanced rule-based chatbot with better context awareness"""
     
     def __init__(self):
-        self.patterns = self._init_patterns()
+        # Templates are read-only; tuples index without list indirection
+        self.patterns = {
+            key: tuple(templates)
+            for key, templates in self._init_patterns().items()
+        }
+        self._rng = random.Random()
         self.context_handlers = self._init_context_handlers()
+        # Intent depends only on the message text, so repeats skip matching
+        self._classify = functools.lru_cache(maxsize=1024)(self._classify_intent)
     
     def _init_patterns(self) -> Dict[str, List[str]]:
         """Initialize response patterns"""
@@ -126,13 +209,14 @@ class SimpleLLM:
         msg_lower = message.lower().strip()
         has_name = user_name != "User"
         has_memory = bool(memory_context)
+        intent = self._classify(msg_lower)
         
         # 1. Handle greetings
-        if self._is_greeting(msg_lower):
+        if intent == "greeting":
             return self._handle_greeting(has_name, has_memory, user_name)
         
         # 2. Handle name introduction
-        if "my name is" in msg_lower or self._is_name_intro(msg_lower):
+        if intent == "name_intro":
             return self._handle_name_introduction(user_name)
         
         # 3. Handle new memory creation
@@ -140,15 +224,15 @@ class SimpleLLM:
             return self._handle_new_memory(new_memory, user_name)
         
         # 4. Handle questions with memory context
-        if self._is_question(message):
+        if intent == "question":
             return self._handle_question(msg_lower, memory_context, user_name)
         
         # 5. Handle scheduling/time-based requests
-        if self._is_scheduling(msg_lower):
+        if intent == "scheduling":
             return self._handle_scheduling(msg_lower, memory_context, user_name)
         
         # 6. Handle goodbyes
-        if self._is_goodbye(msg_lower):
+        if intent == "goodbye":
             return self._handle_goodbye(user_name)
         
         # 7. Handle statements/comments
@@ -156,35 +240,52 @@ class SimpleLLM:
             return self._format_response("default_with_name", name=user_name)
         
         # 8. Default response
-        return random.choice(self.patterns["default"])
+        return self._rng.choice(self.patterns["default"])
+    
+    def _classify_intent(self, msg: str) -> Optional[str]:
+        """
+        Classify a lowercased message, in generate_response's priority order
+        
+        Pure function of the message; cached per instance as _classify
+        
+        Args:
+            msg: Lowercased, stripped message
+            
+        Returns:
+            str: "greeting", "name_intro", "question", "scheduling",
+                 "goodbye", or None for a plain statement
+        """
+        if self._is_greeting(msg):
+            return "greeting"
+        if "my name is" in msg or self._is_name_intro(msg):
+            return "name_intro"
+        if self._is_question(msg):
+            return "question"
+        if self._is_scheduling(msg):
+            return "scheduling"
+        if self._is_goodbye(msg):
+            return "goodbye"
+        return None
     
     def _is_greeting(self, msg: str) -> bool:
         """Check if message is a greeting"""
-        greetings = ["hi", "hello", "hey", "greetings", "good morning", 
-                    "good afternoon", "good evening", "howdy", "sup", "yo"]
-        return any(msg.startswith(g) or msg == g for g in greetings)
+        return msg.startswith(_GREETING_PREFIXES)
     
     def _is_question(self, msg: str) -> bool:
-        """Check if message is a question"""
-        question_words = ["what", "when", "where", "who", "why", "how", "can you", 
-                         "could you", "would you", "do you", "are you", "is there"]
-        return "?" in msg or any(msg.lower().startswith(qw) for qw in question_words)
+        """Check if (lowercased) message is a question"""
+        return "?" in msg or msg.startswith(_QUESTION_PREFIXES)
     
     def _is_scheduling(self, msg: str) -> bool:
         """Check if message is about scheduling"""
-        scheduling_words = ["meeting", "schedule", "call", "appointment", 
-                           "book", "plan", "calendar", "reminder"]
-        return any(word in msg for word in scheduling_words)
+        return _SCHEDULING_RE.search(msg) is not None
     
     def _is_goodbye(self, msg: str) -> bool:
         """Check if message is a goodbye"""
-        goodbyes = ["bye", "goodbye", "see you", "farewell", "later", "take care"]
-        return any(gb in msg for gb in goodbyes)
+        return _GOODBYE_RE.search(msg) is not None
     
     def _is_name_intro(self, msg: str) -> bool:
         """Check if message introduces a name"""
-        patterns = ["i am ", "i'm ", "call me ", "this is "]
-        return any(p in msg for p in patterns)
+        return _NAME_INTRO_RE.search(msg) is not None
     
     def _handle_greeting(self, has_name: bool, has_memory: bool, user_name: str) -> str:
         """Handle greeting messages"""
@@ -192,15 +293,15 @@ class SimpleLLM:
         meet_str = "see you again" if has_memory else "meet you"
         
         if has_memory and has_name:
-            response = random.choice(self.patterns["greeting_with_memory"])
+            response = self._rng.choice(self.patterns["greeting_with_memory"])
         else:
-            response = random.choice(self.patterns["greeting"])
+            response = self._rng.choice(self.patterns["greeting"])
         
         return response.format(name=name_str, meet_again=meet_str)
     
     def _handle_name_introduction(self, user_name: str) -> str:
         """Handle name introduction"""
-        return random.choice(self.patterns["name_introduction"]).format(name=user_name)
+        return self._rng.choice(self.patterns["name_introduction"]).format(name=user_name)
     
     def _handle_new_memory(self, new_memory: Dict, user_name: str) -> str:
         """Handle response when new memory is created"""
@@ -218,7 +319,7 @@ class SimpleLLM:
             )
         
         elif mem_type == "constraint":
-            return random.choice(self.patterns["constraint_noted"])
+            return self._rng.choice(self.patterns["constraint_noted"])
         
         elif mem_type == "commitment":
             task = self._extract_task(content)
@@ -231,24 +332,24 @@ class SimpleLLM:
         elif mem_type == "fact":
             return f"Thanks for sharing! I've noted that information."
         
-        return random.choice(self.patterns["default"])
+        return self._rng.choice(self.patterns["default"])
     
     def _handle_question(self, msg: str, memory_context: str, user_name: str) -> str:
         """Handle questions using memory context"""
         # Name query
-        if "my name" in msg or "what's my name" in msg or "who am i" in msg:
+        if _NAME_QUERY_RE.search(msg):
             return self._handle_name_query(user_name, memory_context)
         
         # Preference query
-        if any(word in msg for word in ["prefer", "like", "favorite", "love"]):
+        if _PREFERENCE_QUERY_RE.search(msg):
             return self._handle_preference_query(memory_context)
         
         # Time/schedule query
-        if any(word in msg for word in ["when", "time", "schedule"]):
+        if _TIME_QUERY_RE.search(msg):
             return self._handle_time_query(memory_context)
         
         # Task query
-        if any(word in msg for word in ["task", "todo", "remind", "commitment"]):
+        if _TASK_QUERY_RE.search(msg):
             return self._handle_task_query(memory_context)
         
         # General query with context
@@ -264,7 +365,7 @@ class SimpleLLM:
     def _handle_preference_query(self, memory_context: str) -> str:
         """Handle preference queries"""
         if not memory_context:
-            return random.choice(self.patterns["no_memory_yet"])
+            return self._rng.choice(self.patterns["no_memory_yet"])
         
         # Extract preferences from context
         prefs = self._extract_from_context(memory_context, "preference")
@@ -298,16 +399,16 @@ class SimpleLLM:
     def _handle_general_query(self, msg: str, memory_context: str, user_name: str) -> str:
         """Handle general queries"""
         if not memory_context:
-            return random.choice(self.patterns["no_memory_yet"])
+            return self._rng.choice(self.patterns["no_memory_yet"])
         
         # Try to extract relevant info from context
         context_info = self._extract_relevant_context(msg, memory_context)
         
         if context_info:
-            response = random.choice(self.patterns["memory_recall"])
+            response = self._rng.choice(self.patterns["memory_recall"])
             return response.format(context=context_info)
         
-        return random.choice(self.patterns["default"])
+        return self._rng.choice(self.patterns["default"])
     
     def _handle_scheduling(self, msg: str, memory_context: str, user_name: str) -> str:
         """Handle scheduling requests"""
@@ -319,98 +420,77 @@ class SimpleLLM:
     def _handle_goodbye(self, user_name: str) -> str:
         """Handle goodbye messages"""
         name_str = f" {user_name}" if user_name != "User" else ""
-        response = random.choice(self.patterns["goodbye"])
+        response = self._rng.choice(self.patterns["goodbye"])
         return response.format(name=name_str)
     
     def _extract_preference_subject(self, content: str) -> Optional[str]:
         """Extract what the preference is about"""
         # Simple extraction - look for common patterns
-        patterns = [
-            r"(?:prefer|like|love|enjoy)\s+(\w+)",
-            r"favorite\s+(\w+)",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(1)
+        match = _PREFERENCE_SUBJECT_RE.match(content.lower())
+        if match:
+            return match.group(match.lastindex)
         
         return None
     
     def _extract_task(self, content: str) -> Optional[str]:
         """Extract task from commitment"""
         # Look for "remind me to X" or similar
-        patterns = [
-            r"remind me (?:to|about)\s+(.+)",
-            r"(?:need|have) to\s+(.+)",
-            r"(?:schedule|book)\s+(.+)"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(1)
+        match = _TASK_RE.match(content.lower())
+        if match:
+            return match.group(match.lastindex)
         
         return content
     
     def _extract_goal(self, content: str) -> Optional[str]:
         """Extract goal from content"""
-        patterns = [
-            r"want to\s+(.+)",
-            r"goal (?:is|:)\s+(.+)",
-            r"(?:trying|planning|hoping) to\s+(.+)"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(1)
+        match = _GOAL_RE.match(content.lower())
+        if match:
+            return match.group(match.lastindex)
         
         return content
     
     def _extract_from_context(self, context: str, keyword: str) -> List[str]:
         """Extract items from context containing keyword"""
-        lines = context.split('\n')
-        results = []
-        
-        for line in lines:
-            if keyword.lower() in line.lower() and '-' in line:
-                # Extract content after dash
-                parts = line.split('-', 1)
-                if len(parts) > 1:
-                    results.append(parts[1].strip())
-        
-        return results
+        # Content after the first dash of each line mentioning the keyword
+        return [item.strip() for item in _context_item_re(keyword).findall(context)]
     
     def _extract_relevant_context(self, msg: str, context: str) -> Optional[str]:
         """Extract most relevant context for the message"""
-        msg_words = set(msg.lower().split())
+        # msg is already lowercased by generate_response
+        msg_words = set(msg.split())
         context_lines = context.split('\n')
+        # Lowercase the whole context once; lower() never adds or drops
+        # newlines, so the lines pair up with the originals
+        lower_lines = context.lower().split('\n')
         
         best_match = None
         best_score = 0
         
-        for line in context_lines:
+        for line, line_lower in zip(context_lines, lower_lines):
             if '-' not in line:
                 continue
             
-            line_words = set(line.lower().split())
-            overlap = len(msg_words & line_words)
+            # Distinct shared words, without building a set per line
+            overlap = len(msg_words.intersection(line_lower.split()))
             
             if overlap > best_score:
                 best_score = overlap
                 parts = line.split('-', 1)
                 if len(parts) > 1:
                     best_match = parts[1].strip()
+                
+                # Every message word matched; no later line can beat it
+                if best_score == len(msg_words):
+                    break
         
         return best_match
     
     def _format_response(self, pattern_key: str, **kwargs) -> str:
         """Format a response with placeholders"""
         if pattern_key not in self.patterns:
-            return random.choice(self.patterns["default"])
+            return self._rng.choice(self.patterns["default"])
         
-        response = random.choice(self.patterns[pattern_key])
+        response = self._rng.choice(self.patterns[pattern_key])
         
         try:
             return response.format(**kwargs)
@@ -432,27 +512,37 @@ class SimpleLLM:
         
         summary_parts = []
         
-        # Group by type
-        by_type = {}
+        # One pass, keeping only what the summary uses per type
+        first_fact = None
+        preferences = []
+        has_constraints = False
+        commitment_count = 0
         for mem in memories:
-            mem_type = mem.get("type", "unknown")
-            if mem_type not in by_type:
-                by_type[mem_type] = []
-            by_type[mem_type].append(mem["content"])
+            mem_type = mem.get("type")
+            if mem_type == "fact":
+                if first_fact is None:
+                    first_fact = mem["content"]
+            elif mem_type == "preference":
+                if len(preferences) < 2:
+                    preferences.append(mem["content"])
+            elif mem_type == "constraint":
+                has_constraints = True
+            elif mem_type == "commitment":
+                commitment_count += 1
         
         # Create summary
-        if "fact" in by_type:
-            summary_parts.append(f"I know that {by_type['fact'][0].lower()}")
+        if first_fact is not None:
+            summary_parts.append(f"I know that {first_fact.lower()}")
         
-        if "preference" in by_type:
-            prefs = ", ".join(by_type['preference'][:2]).lower()
+        if preferences:
+            prefs = ", ".join(preferences).lower()
             summary_parts.append(f"you prefer {prefs}")
         
-        if "constraint" in by_type:
+        if has_constraints:
             summary_parts.append(f"you've set some boundaries")
         
-        if "commitment" in by_type:
-            summary_parts.append(f"you have {len(by_type['commitment'])} pending task(s)")
+        if commitment_count:
+            summary_parts.append(f"you have {commitment_count} pending task(s)")
         
         if len(summary_parts) == 1:
             return summary_parts[0]
@@ -1,185 +1,675 @@
+import functools
+import logging
+import re
 import threading
-from typing import List, Dict, Optional
+import weakref
+from contextlib import contextmanager
+from typing import List, Dict, NamedTuple, Tuple
+from mysql.connector import errorcode, Error as MySQLError
 from database.db import get_connection
 
+logger = logging.getLogger(__name__)
+
+MEMORY_INSERT_SQL = """
+INSERT INTO memory
+(id, user_id, type, content, confidence,
+ created_turn, last_used_turn, use_count, active)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+REINFORCE_SQL = """
+UPDATE memory
+SET confidence = %s,
+    last_used_turn = %s,
+    use_count = use_count + 1,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = %s
+"""
+
+HISTORY_INSERT_SQL = """
+INSERT INTO memory_history
+(memory_id, action, old_confidence, new_confidence)
+VALUES (%s, %s, %s, %s)
+"""
+
+# MySQL's documented "all rows" LIMIT (largest BIGINT UNSIGNED)
+_NO_LIMIT = 18446744073709551615
+
+# A word long enough for the FULLTEXT index (innodb_ft_min_token_size = 3)
+_INDEXABLE_WORD_RE = re.compile(r"\w{3,}")
+
+# InnoDB's default FULLTEXT stopwords (INNODB_FT_DEFAULT_STOPWORD), which
+# MATCH ignores
+_FULLTEXT_STOPWORDS = frozenset({
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en",
+    "for", "from", "how", "i", "in", "is", "it", "la", "of", "on", "or",
+    "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www",
+})
+
+# Negated statements are extracted as constraints, so a constraint can
+# contradict a preference as well as another constraint
+_CONFLICT_TYPES = {
+    "preference": ("preference", "constraint"),
+    "constraint": ("constraint", "preference"),
+}
+
+# Words that turn a statement into its opposite ("I like tea" / "I don't like tea")
+_NEGATION_RE = re.compile(
+    r"\b(?:don't|do not|doesn't|does not|never|not|no longer)\s+"
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _word_set(content: str) -> frozenset:
+    """Lowercased whitespace-separated words of content, cached since the
+    same stored rows are compared again on every insert"""
+    return frozenset(content.lower().split())
+
+
+@functools.lru_cache(maxsize=4096)
+def _has_indexed_word(content: str) -> bool:
+    """Whether content has a word MATCH can find: long enough, not a stopword"""
+    return any(
+        word not in _FULLTEXT_STOPWORDS
+        for word in _INDEXABLE_WORD_RE.findall(content.lower())
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _polarity(content: str) -> Tuple[str, bool]:
+    """Lowercased content without its negation words, and whether it was negated"""
+    statement, negations = _NEGATION_RE.subn("", content.lower())
+    return " ".join(statement.split()), negations % 2 == 1
+
+
+def _contradicts(content: str, other: str) -> bool:
+    """Whether other is content with a negation added or removed"""
+    statement, negated = _polarity(content)
+    return bool(statement) and _polarity(other) == (statement, not negated)
+
+
+def _jaccard(a: frozenset, b: frozenset, threshold: float) -> float:
+    """
+    Jaccard similarity of two non-empty word sets, or 0.0 when their sizes
+    alone rule out reaching threshold (|A ∩ B| / |A ∪ B| <= min / max)
+    """
+    size_a, size_b = len(a), len(b)
+    if min(size_a, size_b) / max(size_a, size_b) < threshold:
+        return 0.0
+
+    intersection = len(a & b)
+    return intersection / (size_a + size_b - intersection)
+
+
+class Memory(NamedTuple):
+    """Active memory row, in the column order of the fetch queries"""
+    id: str
+    type: str
+    content: str
+    confidence: float
+    created_turn: int
+    last_used_turn: int
+    use_count: int = 1
+    content_lower: str = ""
+    tokens: frozenset = frozenset()
+
+    @classmethod
+    def from_row(cls, row) -> "Memory":
+        """Build a Memory from a fetched row, caching lowercased content and its words"""
+        content_lower = row[2].lower()
+        return cls(*row, content_lower, frozenset(content_lower.split()))
+
 
 class MemoryStore:
     """Enhanced persistent memory storage using MySQL"""
 
     def __init__(self):
-        self.lock = threading.Lock()
+        # Writes are serialized per user (dedup reads then writes); the
+        # lock for a user lives only while some thread holds a reference
+        self._user_locks = weakref.WeakValueDictionary()
+        self._user_locks_guard = threading.Lock()
+
+    # =========================
+    # CONNECTIONS
+    # =========================
+    def user_lock(self, user_id) -> threading.Lock:
+        """
+        Lock serializing writes for one user: inserts here, and callers'
+        decay/maintenance passes. Not reentrant; don't hold it across insert.
+        """
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._user_locks[user_id] = lock
+            return lock
+
+    @contextmanager
+    def _connection(self, conn=None):
+        """
+        Borrow a pooled connection; closing it returns it to the pool.
+        A connection passed in by the caller is reused and left open.
+        """
+        if conn is not None:
+            yield conn
+            return
+
+        conn = get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
 
     # =========================
     # INSERT MEMORY
     # =========================
     def insert(self, memory: Dict, user_id: str) -> bool:
-        with self.lock:
+        with self.user_lock(user_id):
             try:
-                conn = get_connection()
-                cursor = conn.cursor(dictionary=True)
+                # One connection and one transaction for the whole insert
+                with self._connection() as conn:
+                    conn.start_transaction()
+                    try:
+                        self._insert(memory, user_id, conn)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                return True
 
-                similar = self._find_similar_memories(
-                    memory["content"], memory["type"], user_id
-                )
+            except Exception:
+                logger.exception("Insert error")
+                return False
+
+    def _insert(self, memory: Dict, user_id: str, conn):
+        similar, conflicts = self._find_related_memories(
+            memory["content"], memory["type"], user_id, conn=conn
+        )
+
+        if similar:
+            existing_id, _, existing_confidence = similar[0]
+
+            new_confidence = min(
+                0.99,
+                (existing_confidence + memory["confidence"]) / 2 + 0.05
+            )
+
+            self._reinforce(existing_id, new_confidence,
+                            memory["created_turn"], conn=conn)
+
+            self._log_history(existing_id, "reinforced",
+                              existing_confidence, new_confidence, conn=conn)
+            return
+
+        self._deactivate_conflicts(conflicts, conn=conn)
+
+        cursor = conn.cursor()
+        cursor.execute(MEMORY_INSERT_SQL, self._memory_row(memory, user_id))
+
+        self._log_history(memory["id"], "created",
+                          None, memory["confidence"], conn=conn)
+
+    # =========================
+    # INSERT MANY
+    # =========================
+    def insert_many(self, memories: List[Dict], user_id: str) -> List[Dict]:
+        """
+        Store several extracted memories the way insert does, one by one,
+        in one transaction. Lookups run first; the writes are then made
+        together, a single statement per kind, so a memory whose lookup
+        fails is skipped without leaving any of its writes behind. A memory
+        similar to one earlier in the same batch reinforces it, and one
+        contradicting it deactivates it.
+
+        Returns:
+            The memories that were stored or reinforced
+        """
+        with self.user_lock(user_id):
+            try:
+                # One pooled connection serves the lookups and the final write
+                with self._connection() as conn:
+                    return self._insert_many(memories, user_id, conn)
+            except Exception:
+                logger.exception("Insert error")
+                return []
+
+    def _insert_many(self, memories: List[Dict], user_id: str, conn) -> List[Dict]:
+        stored = []
+        new_rows = {}
+        history = []
+        # Existing rows: id -> confidence after this batch's reinforcements
+        reinforced = {}
+        reinforcements = []
+        conflicts = {}
+
+        conn.start_transaction()
+        try:
+            for memory in memories:
+                try:
+                    similar, found_conflicts = self._find_related_memories(
+                        memory["content"], memory["type"], user_id, conn=conn
+                    )
+                except Exception:
+                    logger.exception("Insert error")
+                    continue
+
+                # Rows deactivated earlier in the batch are still read back
+                similar = [row for row in similar if row[0] not in conflicts]
 
                 if similar:
-                    existing_id = similar[0]['id']
-                    existing_confidence = similar[0]['confidence']
+                    existing_id = similar[0][0]
+                    existing_confidence = reinforced.get(existing_id, similar[0][2])
 
                     new_confidence = min(
                         0.99,
                         (existing_confidence + memory["confidence"]) / 2 + 0.05
                     )
+                    reinforced[existing_id] = new_confidence
 
-                    self.update_confidence(existing_id, new_confidence)
-                    self.update_last_used(existing_id, memory["created_turn"])
-
-                    self._log_history(existing_id, "reinforced",
-                                      existing_confidence, new_confidence)
-                    conn.close()
-                    return True
+                    reinforcements.append((new_confidence, memory["created_turn"],
+                                           existing_id))
+                    history.append((existing_id, "reinforced",
+                                    existing_confidence, new_confidence))
+                    stored.append(memory)
+                    continue
 
-                self._deactivate_conflicts(
-                    memory["type"], memory["content"], user_id
+                pending, pending_conflicts = self._find_related_pending(
+                    memory, new_rows.values()
                 )
 
-                cursor.execute("""
-                INSERT INTO memory 
-                (id, user_id, type, content, confidence, 
-                 created_turn, last_used_turn, active)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    memory["id"],
-                    user_id,
-                    memory["type"],
-                    memory["content"],
-                    memory["confidence"],
-                    memory["created_turn"],
-                    memory["last_used_turn"],
-                    memory["active"]
-                ))
-
-                self._log_history(memory["id"], "created",
-                                  None, memory["confidence"])
-
-                conn.commit()
-                conn.close()
-                return True
+                if pending is not None:
+                    # Same update as above, applied before the row is written
+                    old_confidence = pending[4]
+                    pending[4] = min(
+                        0.99, (old_confidence + memory["confidence"]) / 2 + 0.05
+                    )
+                    pending[6] = memory["created_turn"]
+                    pending[7] += 1
+
+                    history.append((pending[0], "reinforced",
+                                    old_confidence, pending[4]))
+                    stored.append(memory)
+                    continue
+
+                for mem_id, confidence in found_conflicts:
+                    conflicts.setdefault(mem_id, reinforced.get(mem_id, confidence))
+
+                # A contradicted row from this batch is written inactive
+                for row in pending_conflicts:
+                    row[8] = False
+                    history.append((row[0], "conflict", row[4], None))
+
+                new_rows[memory["id"]] = list(self._memory_row(memory, user_id))
+                history.append((memory["id"], "created",
+                                None, memory["confidence"]))
+                stored.append(memory)
+
+            cursor = conn.cursor()
+            if reinforcements:
+                cursor.executemany(REINFORCE_SQL, reinforcements)
+            self._deactivate_conflicts(conflicts.items(), conn=conn)
+            if new_rows:
+                cursor.executemany(MEMORY_INSERT_SQL, list(new_rows.values()))
+            if history:
+                cursor.executemany(HISTORY_INSERT_SQL, history)
+            conn.commit()
+
+        except Exception:
+            conn.rollback()
+            logger.exception("Insert error")
+            return []
+
+        return stored
+
+    @staticmethod
+    def _memory_row(memory: Dict, user_id: str) -> tuple:
+        """Values for MEMORY_INSERT_SQL"""
+        return (
+            memory["id"],
+            user_id,
+            memory["type"],
+            memory["content"],
+            memory["confidence"],
+            memory["created_turn"],
+            memory["last_used_turn"],
+            1,
+            memory["active"]
+        )
+
+    @staticmethod
+    def _find_related_pending(memory: Dict, rows, threshold=0.7):
+        """
+        Not-yet-written rows related to memory, as _find_related_memories
+        finds them among written ones
 
-            except Exception as e:
-                print("Insert error:", e)
-                return False
+        Returns:
+            (first similar row or None, rows memory contradicts)
+        """
+        content_words = _word_set(memory["content"])
+        if not content_words:
+            return None, []
 
-    # =========================
-    # FIND SIMILAR
-    # =========================
-    def _find_similar_memories(self, content, mem_type, user_id,
-                               threshold=0.7):
+        conflict_types = _CONFLICT_TYPES.get(memory["type"], (memory["type"],))
+        negated = _polarity(memory["content"])[1]
+        conflicts = []
 
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        for row in rows:
+            if not row[8] or row[2] not in conflict_types:
+                continue
 
-        cursor.execute("""
-        SELECT id, content, confidence, created_turn, last_used_turn
-        FROM memory
-        WHERE user_id = %s AND type = %s AND active = 1
-        """, (user_id, mem_type))
+            if _contradicts(memory["content"], row[3]):
+                conflicts.append(row)
+                continue
+
+            if row[2] != memory["type"] or _polarity(row[3])[1] != negated:
+                continue
+
+            row_words = _word_set(row[3])
+            if not row_words:
+                continue
+
+            if _jaccard(content_words, row_words, threshold) >= threshold:
+                return row, []
 
-        memories = cursor.fetchall()
-        conn.close()
+        return None, conflicts
+
+    # =========================
+    # FIND RELATED
+    # =========================
+    def _find_related_memories(self, content, mem_type, user_id,
+                               threshold=0.7, conn=None):
+        """
+        Active memories similar to content, and those it contradicts.
+
+        Similar: same type and polarity (negated or not), word overlap with
+        content (Jaccard) at least threshold. Contradicted: the same words
+        with a negation added or removed, as in "I like tea" and "I don't
+        like tea", in the same type or, for preferences and constraints,
+        each other's.
+
+        The FULLTEXT index narrows the rows to those sharing an indexed
+        word with content, so only candidates come back to be scored here.
+        Content made only of stopwords and words too short to be indexed
+        cannot use it, so every row is scored instead.
+
+        Returns:
+            (similar (id, content, confidence) rows,
+             contradicted (id, confidence) pairs)
+        """
+        content_words = _word_set(content)
+        if not content_words:
+            return [], []
+
+        types = _CONFLICT_TYPES.get(mem_type, (mem_type,))
+        placeholders = ", ".join(["%s"] * len(types))
+
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
+            memories = None
+
+            if _has_indexed_word(content):
+                try:
+                    cursor.execute(f"""
+                    SELECT id, type, content, confidence
+                    FROM memory
+                    WHERE user_id = %s AND type IN ({placeholders}) AND active = 1
+                      AND MATCH(content) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                    """, (user_id, *types, content))
+                    memories = cursor.fetchall()
+                except MySQLError as e:
+                    if e.errno != errorcode.ER_FT_MATCHING_KEY_NOT_FOUND:
+                        raise
+
+            if memories is None:
+                cursor.execute(f"""
+                SELECT id, type, content, confidence
+                FROM memory
+                WHERE user_id = %s AND type IN ({placeholders}) AND active = 1
+                """, (user_id, *types))
+                memories = cursor.fetchall()
 
         similar = []
-        content_words = set(content.lower().split())
+        conflicts = []
+        # A statement and its negation share most words but conflict
+        negated = _polarity(content)[1]
 
-        for mem in memories:
-            mem_words = set(mem['content'].lower().split())
+        for mem_id, row_type, mem_content, confidence in memories:
+            if _contradicts(content, mem_content):
+                conflicts.append((mem_id, confidence))
+                continue
 
-            if not content_words or not mem_words:
+            mem_words = _word_set(mem_content)
+
+            if (row_type != mem_type or not mem_words
+                    or _polarity(mem_content)[1] != negated):
                 continue
 
-            intersection = len(content_words & mem_words)
-            union = len(content_words | mem_words)
+            if _jaccard(content_words, mem_words, threshold) >= threshold:
+                similar.append((mem_id, mem_content, confidence))
+
+        return similar, conflicts
 
-            if union > 0:
-                similarity = intersection / union
-                if similarity >= threshold:
-                    similar.append(mem)
+    # =========================
+    # DEACTIVATE CONFLICTS
+    # =========================
+    def _deactivate_conflicts(self, conflicts, conn=None):
+        """
+        Deactivate memories a new one contradicts, logging each
+
+        Args:
+            conflicts: (id, confidence) pairs from _find_related_memories
+        """
+        conflicts = list(conflicts)
+        if not conflicts:
+            return
 
-        return similar
+        placeholders = ", ".join(["%s"] * len(conflicts))
+
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"""
+            UPDATE memory
+            SET active = 0,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+            """, [mem_id for mem_id, _ in conflicts])
+
+            cursor.executemany(HISTORY_INSERT_SQL, [
+                (mem_id, "conflict", confidence, None)
+                for mem_id, confidence in conflicts
+            ])
 
     # =========================
     # LOG HISTORY
     # =========================
     def _log_history(self, memory_id, action,
-                     old_confidence, new_confidence):
+                     old_confidence, new_confidence, conn=None):
 
-        conn = get_connection()
-        cursor = conn.cursor()
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(HISTORY_INSERT_SQL,
+                           (memory_id, action, old_confidence, new_confidence))
 
-        cursor.execute("""
-        INSERT INTO memory_history
-        (memory_id, action, old_confidence, new_confidence)
-        VALUES (%s, %s, %s, %s)
-        """, (memory_id, action, old_confidence, new_confidence))
+    # =========================
+    # REINFORCE
+    # =========================
+    def _reinforce(self, mem_id, new_confidence, turn, conn=None):
+        """update_confidence and update_last_used in a single statement"""
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            cursor.execute(REINFORCE_SQL, (new_confidence, turn, mem_id))
 
     # =========================
     # UPDATE LAST USED
     # =========================
-    def update_last_used(self, mem_id, turn):
-        conn = get_connection()
-        cursor = conn.cursor()
+    def update_last_used(self, mem_id, turn, conn=None):
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+            UPDATE memory
+            SET last_used_turn = %s,
+                use_count = use_count + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """, (turn, mem_id))
 
-        cursor.execute("""
-        UPDATE memory
-        SET last_used_turn = %s,
-            use_count = use_count + 1,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-        """, (turn, mem_id))
+    # =========================
+    # UPDATE CONFIDENCE
+    # =========================
+    def update_confidence(self, mem_id, new_confidence, conn=None):
+        with self._connection(conn) as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            cursor.execute("""
+            UPDATE memory
+            SET confidence = %s,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """, (new_confidence, mem_id))
 
     # =========================
-    # UPDATE CONFIDENCE
+    # FETCH ACTIVE
     # =========================
-    def update_confidence(self, mem_id, new_confidence):
-        conn = get_connection()
-        cursor = conn.cursor()
+    def fetch_active(self, user_id, limit=None) -> List[Memory]:
+        query = """
+        SELECT id, type, content, confidence, 
+               created_turn, last_used_turn, use_count
+        FROM memory
+        WHERE user_id = %s AND active = 1
+        ORDER BY confidence DESC, last_used_turn DESC
+        LIMIT %s
+        """
 
-        cursor.execute("""
-        UPDATE memory
-        SET confidence = %s,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-        """, (new_confidence, mem_id))
+        # Bound rather than formatted in, so the statement text never varies
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (user_id, limit or _NO_LIMIT))
+            results = [Memory.from_row(row) for row in cursor.fetchall()]
 
-        conn.commit()
-        conn.close()
+        return results
 
     # =========================
-    # FETCH ACTIVE
+    # FETCH DECAYABLE
     # =========================
-    def fetch_active(self, user_id, limit=None):
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+    def fetch_decayable(self, user_id, cutoff_turn) -> List[Memory]:
+        """
+        Fetch active memories last used at or before cutoff_turn, i.e. old
+        enough to decay. Served by the (user_id, active, last_used_turn) index.
+        """
+        query = """
+        SELECT id, type, content, confidence, 
+               created_turn, last_used_turn, use_count
+        FROM memory
+        WHERE user_id = %s AND active = 1 AND last_used_turn <= %s
+        """
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (user_id, cutoff_turn))
+            return [Memory.from_row(row) for row in cursor.fetchall()]
+
+    # =========================
+    # FETCH MATCHING (FULLTEXT)
+    # =========================
+    def fetch_matching(self, user_id, keywords) -> List[Memory]:
+        """
+        Fetch active memories whose content matches any keyword, using
+        the FULLTEXT index on content. Falls back to all active memories
+        when the index is unavailable; callers still filter the rows.
+        """
+        terms = {
+            word + "*"
+            for keyword in keywords
+            for word in re.findall(r"\w+", keyword.lower())
+        }
+
+        if not terms:
+            return []
 
         query = """
         SELECT id, type, content, confidence, 
                created_turn, last_used_turn, use_count
         FROM memory
         WHERE user_id = %s AND active = 1
+          AND MATCH(content) AGAINST (%s IN BOOLEAN MODE)
         ORDER BY confidence DESC, last_used_turn DESC
         """
 
-        if limit:
-            query += f" LIMIT {limit}"
-
-        cursor.execute(query, (user_id,))
-        results = cursor.fetchall()
-        conn.close()
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, (user_id, " ".join(sorted(terms))))
+                return [Memory.from_row(row) for row in cursor.fetchall()]
+        except MySQLError as e:
+            if e.errno != errorcode.ER_FT_MATCHING_KEY_NOT_FOUND:
+                raise
+            return self.fetch_active(user_id)
 
-        return results
+    # =========================
+    # BATCH UPDATES
+    # =========================
+    def batch_update_confidence(self, pairs):
+        """Set confidence for many memories in one UPDATE statement"""
+        pairs = list(pairs)
+        if not pairs:
+            return
+
+        cases = " ".join("WHEN %s THEN %s" for _ in pairs)
+        placeholders = ", ".join(["%s"] * len(pairs))
+
+        params = []
+        for mem_id, confidence in pairs:
+            params.extend((mem_id, confidence))
+        params.extend(mem_id for mem_id, _ in pairs)
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"""
+            UPDATE memory
+            SET confidence = CASE id {cases} END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+            """, params)
+
+    def batch_update_last_used(self, mem_ids, turn):
+        """Mark many memories as used at the given turn in one statement"""
+        mem_ids = list(mem_ids)
+        if not mem_ids:
+            return
+
+        placeholders = ", ".join(["%s"] * len(mem_ids))
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"""
+            UPDATE memory
+            SET last_used_turn = %s,
+                use_count = use_count + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+            """, (turn, *mem_ids))
+
+    def batch_deactivate(self, mem_ids):
+        """Deactivate many memories in one statement"""
+        mem_ids = list(mem_ids)
+        if not mem_ids:
+            return
+
+        placeholders = ", ".join(["%s"] * len(mem_ids))
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"""
+            UPDATE memory
+            SET active = 0,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+            """, mem_ids)
@@ -0,0 +1,72 @@
+"""Tests for the extractor's pattern compilation"""
+
+import unittest
+from unittest import mock
+
+from long_term import extractor
+
+# Non-ASCII word characters and spaces are where re and RE2 used to differ
+MESSAGES = [
+    "i like green tea",
+    "i love café au lait",
+    "my name is josé",
+    "my name is\xa0zoë",
+    "i am émile",
+    "i am a teacher",
+    "remind me to call mom",
+    "my wife is named ana",
+    "jürgen is my colleague",
+    "nothing to remember here",
+]
+
+
+def _matches(memory_extractor):
+    return {
+        mem_type: [
+            match.group(0) if match else None
+            for match in map(config["regex"].search, MESSAGES)
+        ]
+        for mem_type, config in memory_extractor.patterns.items()
+    }
+
+
+class CompileLinearTest(unittest.TestCase):
+    
+    def _check_unicode_names(self, memory_extractor):
+        fact = memory_extractor.patterns["fact"]["regex"]
+        self.assertEqual(fact.search("my name is josé").group(1), "josé")
+        self.assertEqual(fact.search("my name is\xa0zoë").group(1), "zoë")
+        self.assertIsNotNone(fact.search("i am émile"))
+    
+    def test_re_path_is_unicode(self):
+        with mock.patch.object(extractor, "re2", None):
+            self._check_unicode_names(extractor.MemoryExtractor())
+    
+    @unittest.skipIf(extractor.re2 is None, "google-re2 is not installed")
+    def test_re2_path_is_unicode(self):
+        self._check_unicode_names(extractor.MemoryExtractor())
+    
+    @unittest.skipIf(extractor.re2 is None, "google-re2 is not installed")
+    def test_re2_and_re_paths_agree(self):
+        with mock.patch.object(extractor, "re2", None):
+            expected = _matches(extractor.MemoryExtractor())
+        
+        self.assertEqual(_matches(extractor.MemoryExtractor()), expected)
+
+
+class TimePreferenceTest(unittest.TestCase):
+    
+    def test_am_pm_against_digits(self):
+        for message in ("Text me after 9pm", "Reach me at 8am",
+                        "Ping me before 10am on weekdays", "Call me at 9 pm"):
+            with self.subTest(message=message):
+                memory = extractor.extract_memory(message, turn=1)
+                self.assertIsNotNone(memory)
+                self.assertEqual(memory["type"], "preference")
+    
+    def test_time_word_inside_another_word(self):
+        self.assertIsNone(extractor.extract_memory("What's my name?", turn=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Tests for RelevanceCache across chat turns"""
+
+import unittest
+from typing import NamedTuple
+from unittest import mock
+
+from long_term import retrieval
+from long_term.decay import apply_decay, boost_related_memories, refresh_memories
+from long_term.retrieval import RelevanceCache, extract_keywords
+
+
+class Row(NamedTuple):
+    """The Memory fields retrieval and decay read"""
+    id: str
+    type: str
+    content: str
+    confidence: float
+    created_turn: int
+    last_used_turn: int
+    use_count: int = 1
+    content_lower: str = ""
+    tokens: frozenset = frozenset()
+
+
+def _row(mem_id, mem_type, content, confidence, turn):
+    lower = content.lower()
+    return Row(mem_id, mem_type, content, confidence, turn, turn, 1,
+               lower, frozenset(lower.split()))
+
+
+class FakeStore:
+    """In-memory rows with the batch writes the chat turn makes"""
+    
+    def __init__(self, rows):
+        self.rows = {row.id: row for row in rows}
+    
+    def fetch_active(self, user_id):
+        return list(self.rows.values())
+    
+    def batch_update_confidence(self, updates):
+        for mem_id, confidence in updates:
+            self.rows[mem_id] = self.rows[mem_id]._replace(confidence=confidence)
+    
+    def batch_update_last_used(self, mem_ids, turn):
+        for mem_id in mem_ids:
+            row = self.rows[mem_id]
+            self.rows[mem_id] = row._replace(last_used_turn=turn,
+                                             use_count=row.use_count + 1)
+    
+    def batch_deactivate(self, mem_ids):
+        for mem_id in mem_ids:
+            del self.rows[mem_id]
+
+
+def _chat_turn(store, cache, message, turn):
+    """The memory part of app.chat for a message that adds no memories"""
+    memories = apply_decay(store, "u1", turn, store.fetch_active("u1"))
+    relevant = cache.retrieve("u1", message, memories, top_k=5, min_score=0.1)
+    memories = boost_related_memories(
+        store, "u1", turn, extract_keywords(message),
+        boost_amount=0.01, memories=memories
+    )
+    confidences = {mem.id: mem.confidence for mem in memories}
+    refresh_memories(
+        store,
+        {mem["id"]: confidences.get(mem["id"], mem["confidence"])
+         for mem in relevant},
+        turn, boost=0.01
+    )
+    return relevant
+
+
+class RelevanceCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.store = FakeStore([
+            _row("tea", "preference", "I like green tea", 0.9, 1),
+            _row("job", "fact", "I work at the hospital", 0.95, 1),
+            _row("gym", "commitment", "Remind me to go to the gym", 0.85, 2),
+        ])
+        self.cache = RelevanceCache()
+    
+    def test_repeated_chat_turn_hits(self):
+        with mock.patch.object(retrieval, "retrieve_relevant",
+                               wraps=retrieval.retrieve_relevant) as ranked:
+            first = _chat_turn(self.store, self.cache, "what tea do I like", 5)
+            second = _chat_turn(self.store, self.cache, "what tea do I like", 6)
+        
+        self.assertEqual(ranked.call_count, 1)
+        self.assertEqual([mem["id"] for mem in second],
+                         [mem["id"] for mem in first])
+        # Live fields come from the current rows, not the cached result
+        self.assertEqual(second[0]["id"], "tea")
+        self.assertGreater(second[0]["use_count"], first[0]["use_count"])
+        self.assertGreater(second[0]["confidence"], first[0]["confidence"])
+    
+    def test_changed_memories_miss(self):
+        with mock.patch.object(retrieval, "retrieve_relevant",
+                               wraps=retrieval.retrieve_relevant) as ranked:
+            _chat_turn(self.store, self.cache, "what tea do I like", 5)
+            self.store.batch_deactivate(["gym"])
+            _chat_turn(self.store, self.cache, "what tea do I like", 6)
+            self.cache.invalidate("u1")
+            _chat_turn(self.store, self.cache, "what tea do I like", 7)
+        
+        self.assertEqual(ranked.call_count, 3)
+    
+    def test_users_are_evicted_least_recent_first(self):
+        cache = RelevanceCache(max_users=2)
+        memories = self.store.fetch_active("u1")
+        for user_id in ("a", "b", "a", "c"):
+            cache.retrieve(user_id, "green tea", memories)
+        
+        self.assertEqual(list(cache._users), ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+"""Tests for MemoryStore's batch insert, against a fake connection"""
+
+import sys
+import types
+import unittest
+from unittest import mock
+
+try:
+    import mysql.connector  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest("mysql-connector-python is not installed")
+
+# database.db opens its pool on import; the tests pass connections in
+_db = types.ModuleType("database.db")
+_db.get_connection = mock.Mock(side_effect=AssertionError("no pool in tests"))
+
+with mock.patch.dict(sys.modules, {
+    "database": types.ModuleType("database"),
+    "database.db": _db,
+}):
+    from long_term import store
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = []
+
+    def execute(self, sql, params=()):
+        statement = " ".join(sql.split())
+        if any(text in params for text in self.conn.fail_lookup_of):
+            raise RuntimeError("lookup failed")
+        self.conn.log.append(("execute", statement, tuple(params)))
+        self._result = []
+        if not statement.startswith("SELECT"):
+            return
+
+        # The lookups filter on (user_id, *types[, MATCH text]) and read
+        # (id, type, content, confidence)
+        words = None
+        types = params[1:]
+        if "MATCH(content)" in statement:
+            types = params[1:-1]
+            words = set(store._INDEXABLE_WORD_RE.findall(params[-1].lower()))
+            words -= store._FULLTEXT_STOPWORDS
+
+        for row in self.conn.rows:
+            if row[1] not in types:
+                continue
+            if words is not None and not words & set(row[2].lower().split()):
+                continue
+            self._result.append(row)
+
+    def executemany(self, sql, rows):
+        statement = " ".join(sql.split())
+        if statement in self.conn.fail_on:
+            raise RuntimeError("write failed")
+        self.conn.log.append(("executemany", statement, list(rows)))
+
+    def fetchall(self):
+        return self._result
+
+
+class FakeConnection:
+    """Records statements and transaction boundaries in order"""
+
+    def __init__(self, rows=(), fail_on=(), fail_lookup_of=()):
+        self.rows = list(rows)
+        self.fail_on = {" ".join(sql.split()) for sql in fail_on}
+        self.fail_lookup_of = set(fail_lookup_of)
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        self.log.append("begin")
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def statements(self, verb):
+        return [entry for entry in self.log
+                if entry not in ("begin", "commit", "rollback")
+                and entry[1].startswith(verb)]
+
+    def written(self, sql):
+        sql = " ".join(sql.split())
+        return [row for entry in self.log
+                if entry not in ("begin", "commit", "rollback")
+                and entry[0] == "executemany" and entry[1] == sql
+                for row in entry[2]]
+
+
+def _memory(mem_id, content, mem_type="preference", confidence=0.8):
+    return {
+        "id": mem_id,
+        "type": mem_type,
+        "content": content,
+        "confidence": confidence,
+        "created_turn": 5,
+        "last_used_turn": 5,
+        "active": True,
+    }
+
+
+class InsertManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = store.MemoryStore()
+        self.batch = [_memory("m1", "I like tea"), _memory("m2", "I enjoy hiking")]
+
+    def test_mixed_batch_writes_in_one_transaction(self):
+        conn = FakeConnection(rows=[("old", "preference", "I like tea", 0.6)])
+
+        stored = self.store._insert_many(self.batch, "u1", conn)
+
+        self.assertEqual(stored, self.batch)
+        self.assertEqual(conn.log[0], "begin")
+        self.assertEqual(conn.log[-1], "commit")
+        self.assertNotIn("rollback", conn.log)
+        # One lookup per memory, and nothing else read
+        self.assertEqual(len(conn.statements("SELECT")), 2)
+
+        self.assertEqual(conn.written(store.REINFORCE_SQL), [(0.75, 5, "old")])
+        self.assertEqual([row[0] for row in conn.written(store.MEMORY_INSERT_SQL)],
+                         ["m2"])
+        self.assertEqual(conn.written(store.HISTORY_INSERT_SQL), [
+            ("old", "reinforced", 0.6, 0.75),
+            ("m2", "created", None, 0.8),
+        ])
+
+    def test_failed_batch_rolls_back_reinforcements(self):
+        conn = FakeConnection(rows=[("old", "preference", "I like tea", 0.6)],
+                              fail_on=[store.MEMORY_INSERT_SQL])
+
+        with self.assertLogs(store.logger, "ERROR"):
+            stored = self.store._insert_many(self.batch, "u1", conn)
+
+        self.assertEqual(stored, [])
+        self.assertEqual(conn.log[-1], "rollback")
+        self.assertNotIn("commit", conn.log)
+        # The reinforcement ran inside the rolled-back transaction
+        self.assertEqual(conn.written(store.REINFORCE_SQL), [(0.75, 5, "old")])
+        self.assertEqual(conn.log[0], "begin")
+
+    def test_failed_lookup_skips_only_that_memory(self):
+        conn = FakeConnection(rows=[("old", "constraint", "I don't like tea", 0.7)],
+                              fail_lookup_of=["I like tea"])
+
+        with self.assertLogs(store.logger, "ERROR"):
+            stored = self.store._insert_many(self.batch, "u1", conn)
+
+        self.assertEqual(stored, self.batch[1:])
+        self.assertEqual(conn.statements("UPDATE"), [])
+        self.assertEqual(conn.written(store.HISTORY_INSERT_SQL),
+                         [("m2", "created", None, 0.8)])
+        self.assertEqual(conn.log[-1], "commit")
+
+    def test_preference_deactivates_negated_constraint(self):
+        conn = FakeConnection(rows=[
+            ("old", "constraint", "I don't like coffee.", 0.7),
+            ("fact", "fact", "I don't like coffee.", 0.9),
+        ])
+
+        stored = self.store._insert_many(
+            [_memory("m1", "I like coffee.")], "u1", conn
+        )
+
+        self.assertEqual(len(stored), 1)
+        (select,) = conn.statements("SELECT")
+        self.assertEqual(select[2][:3], ("u1", "preference", "constraint"))
+        (deactivate,) = conn.statements("UPDATE")
+        self.assertIn("SET active = 0", deactivate[1])
+        self.assertEqual(deactivate[2], ("old",))
+        self.assertEqual(conn.written(store.HISTORY_INSERT_SQL), [
+            ("old", "conflict", 0.7, None),
+            ("m1", "created", None, 0.8),
+        ])
+        self.assertEqual(conn.log[-1], "commit")
+
+    def test_conflict_within_the_batch(self):
+        conn = FakeConnection()
+
+        self.store._insert_many([
+            _memory("m1", "I like coffee."),
+            _memory("m2", "I don't like coffee.", mem_type="constraint"),
+        ], "u1", conn)
+
+        rows = {row[0]: row for row in conn.written(store.MEMORY_INSERT_SQL)}
+        self.assertFalse(rows["m1"][8])
+        self.assertTrue(rows["m2"][8])
+        self.assertIn(("m1", "conflict", 0.8, None),
+                      conn.written(store.HISTORY_INSERT_SQL))
+
+
+class FindRelatedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = store.MemoryStore()
+
+    def test_new_memory_runs_one_select(self):
+        conn = FakeConnection(rows=[("old", "preference", "I like tea", 0.6)])
+
+        related = self.store._find_related_memories(
+            "I enjoy hiking", "preference", "u1", conn=conn
+        )
+
+        self.assertEqual(related, ([], []))
+        (select,) = conn.statements("SELECT")
+        self.assertIn("MATCH(content)", select[1])
+
+    def test_stopword_content_falls_back_to_full_scan(self):
+        conn = FakeConnection(rows=[("old", "fact", "this is what it was", 0.6)])
+
+        similar, _ = self.store._find_related_memories(
+            "this is what it was", "fact", "u1", conn=conn
+        )
+
+        self.assertEqual([row[0] for row in similar], ["old"])
+        (select,) = conn.statements("SELECT")
+        self.assertNotIn("MATCH(content)", select[1])
+
+
+if __name__ == "__main__":
+    unittest.main()